@@ -0,0 +1,214 @@
+"""
+卡表构建：把 xlsx 工作簿（策划维护的源数据）导出成游戏读取的 CSV
+
+用法：
+    python build_content.py            # 只重新导出工作簿有变化的表
+    python build_content.py --force    # 全部重新导出（包括和 CSV 有冲突的表）
+    python build_content.py --dry-run  # 只列出需要导出的表和冲突
+    python build_content.py -j 4       # 指定并行进程数（默认 CPU 核数）
+
+判断「有变化」（不看修改时间，只比内容）：
+- CSV 不存在：导出
+- 工作簿 sha1 和上次记录的相同：跳过（只是被 touch 不会重新导出）
+- 工作簿导出的内容和现有 CSV 相同：不导出，只记下基线
+- 内容不同，且 CSV 仍是上次导出的原样（CSV sha1 和记录相同）：导出
+- 内容不同，但 CSV 没有记录或被手工改过：打印差异、不覆盖，确认后用 --force
+构建状态（工作簿 sha1 + CSV sha1）保存在 .card_cache/build_state.json。
+"""
+import argparse
+import csv
+import difflib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core import catalog
+from core import csvio
+from core import xlsx
+
+# ===================== 工作簿 -> CSV 清单 =====================
+CONTENT_MANIFEST = {
+    "eventcard.csv": "事件卡.xlsx",
+    "mapcard.csv": "地图卡.xlsx",
+    "passagecard.csv": "通道卡.xlsx",
+    "action_card.csv": "行动卡.xlsx",
+    "weapon.csv": "装备卡-武器卡.xlsx",
+    "enemycharacter.csv": "enemycharacter.xlsx",
+}
+
+STATE_FILE = "build_state.json"
+DIFF_LINES = 20   # 冲突时最多打印的差异行数
+
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _load_state():
+    path = os.path.join(catalog.get_cache_dir(), STATE_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(state):
+    cache_dir = catalog.get_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, STATE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ===================== 单表导出（在子进程中运行） =====================
+def workbook_rows(xlsx_path):
+    """工作簿第一个工作表导出成 CSV 时的各行（表头决定列数，去掉尾部的空表头）"""
+    width = None
+    for row in xlsx.iter_rows(xlsx_path):
+        if width is None:
+            while row and not row[-1].strip():
+                row.pop()
+            width = len(row)
+        yield row[:width] + [""] * (width - len(row))
+
+def convert_workbook(xlsx_path, csv_path):
+    """流式读取工作簿第一个工作表，写出 utf-8-sig 编码的 CSV；返回数据行数"""
+    tmp_path = f"{csv_path}.{os.getpid()}.tmp"
+    count = -1
+    with open(tmp_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        for row in workbook_rows(xlsx_path):
+            writer.writerow(row)
+            count += 1
+    os.replace(tmp_path, csv_path)
+    return max(count, 0)
+
+
+# ===================== 内容比对 =====================
+def csv_rows(csv_path):
+    """现有 CSV 的各行（跳过空行，去掉表头的 BOM）"""
+    with open(csv_path, "rb") as f:
+        raw = f.read()
+    rows = [row for row in csvio.iter_rows(io.BytesIO(raw), csvio.sniff_encoding(raw)) if row]
+    if rows:
+        rows[0] = [cell.replace("\ufeff", "") for cell in rows[0]]
+    return rows
+
+def content_diff(xlsx_path, csv_path):
+    """工作簿导出结果与现有 CSV 的差异（unified diff 行列表），内容相同返回 []"""
+    new = [",".join(row) for row in workbook_rows(xlsx_path)]
+    old = [",".join(row) for row in csv_rows(csv_path)]
+    if new == old:
+        return []
+    return list(difflib.unified_diff(old, new, os.path.basename(csv_path),
+                                     os.path.basename(xlsx_path), n=0, lineterm=""))
+
+
+# ===================== 增量判断 =====================
+def _print_conflict(csv_name, xlsx_name, diff):
+    print(f"⚠️ {xlsx_name} 与现有 {csv_name} 内容不同，且 {csv_name} 不是上次导出的原样，未覆盖：")
+    for line in diff[:DIFF_LINES]:
+        print(f"    {line}")
+    if len(diff) > DIFF_LINES:
+        print(f"    …（共 {len(diff)} 行差异）")
+    print("   确认以工作簿为准后用 --force 重新导出")
+
+def plan_build(manifest=CONTENT_MANIFEST, force=False, record_baseline=True):
+    """
+    返回需要导出的 [(csv名, xlsx名, 工作簿sha1)]；缺失的工作簿打印提示后跳过
+    与 CSV 有冲突的表打印差异后跳过（force=True 时照样导出）
+    """
+    state = _load_state()
+    todo = []
+    baseline = False
+    for csv_name, xlsx_name in manifest.items():
+        xlsx_path = catalog.safe_path(xlsx_name)
+        csv_path = catalog.safe_path(csv_name)
+        if not os.path.exists(xlsx_path):
+            print(f"⚠️ 未找到工作簿：{xlsx_name}，跳过 {csv_name}")
+            continue
+        digest = _file_sha1(xlsx_path)
+        if force or not os.path.exists(csv_path):
+            todo.append((csv_name, xlsx_name, digest))
+            continue
+        recorded = state.get(csv_name) or {}
+        if recorded.get("sha1") == digest and recorded.get("source") == xlsx_name:
+            continue
+        csv_digest = _file_sha1(csv_path)
+        diff = content_diff(xlsx_path, csv_path)
+        if not diff:
+            # 内容一致（第一次运行或工作簿只是另存过）：记下基线，之后按内容变化判断
+            state[csv_name] = {"source": xlsx_name, "sha1": digest, "csv_sha1": csv_digest}
+            baseline = True
+        elif recorded.get("csv_sha1") == csv_digest:
+            todo.append((csv_name, xlsx_name, digest))
+        else:
+            _print_conflict(csv_name, xlsx_name, diff)
+    if baseline and record_baseline:
+        _save_state(state)
+    return todo
+
+def build(manifest=CONTENT_MANIFEST, force=False, jobs=None):
+    """并行导出有变化的表，成功后刷新卡牌目录缓存；返回导出的 CSV 名列表"""
+    todo = plan_build(manifest, force)
+    if not todo:
+        print("✅ 没有需要导出的卡表")
+        return []
+
+    state = _load_state()
+    done = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(convert_workbook, catalog.safe_path(xlsx_name), catalog.safe_path(csv_name)):
+                (csv_name, xlsx_name, digest)
+            for csv_name, xlsx_name, digest in todo
+        }
+        for future, (csv_name, xlsx_name, digest) in futures.items():
+            try:
+                count = future.result()
+            except Exception as e:
+                print(f"❌ 导出 {xlsx_name} -> {csv_name} 失败：{e}")
+                continue
+            state[csv_name] = {"source": xlsx_name, "sha1": digest,
+                               "csv_sha1": _file_sha1(catalog.safe_path(csv_name))}
+            done.append(csv_name)
+            print(f"✅ {xlsx_name} -> {csv_name}（{count} 行）")
+    _save_state(state)
+
+    # 预编译目录缓存，游戏启动时直接命中
+    catalog.preload(done)
+    print(f"⏱️ 导出 {len(done)} 张表，用时 {time.perf_counter() - start:.2f} 秒")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把 xlsx 工作簿增量导出成游戏 CSV 卡表")
+    parser.add_argument("--force", action="store_true",
+                        help="忽略构建状态，全部重新导出（会覆盖与工作簿不同的 CSV）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要导出的表和冲突")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        todo = plan_build(force=args.force, record_baseline=False)
+        for csv_name, xlsx_name, _ in todo:
+            print(f"{xlsx_name} -> {csv_name}")
+        if not todo:
+            print("✅ 没有需要导出的卡表")
+        return 0
+
+    build(force=args.force, jobs=args.jobs)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
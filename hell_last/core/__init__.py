@@ -0,0 +1,13 @@
+# core - 与界面无关的游戏数据/规则层（不依赖 tkinter）
+# 子模块按需导入：import core 本身不读盘、不加载任何子模块，
+# core.data / core.store 等在第一次访问属性时才真正导入。
+import importlib
+
+__all__ = ["analytics", "battle", "battlelog", "catalog", "csvio", "data", "deck", "dice", "eventlog", "listdiff", "markov", "probability", "records", "rng", "spatial", "store", "util", "xlsx"]
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f"{__name__}.{name}")
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
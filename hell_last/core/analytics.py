@@ -0,0 +1,149 @@
+import os
+import pickle
+import struct
+
+from core import catalog
+from core import data
+from core import probability as prob
+
+# ===================== 武器 × 敌人 分析表 =====================
+# 商店排序/筛选用的预计算矩阵，每个 (武器, 敌人) 一格：
+# - damage：每回合预计伤害 = 1 次攻击（一张 +1 攻击卡）+ 装备额外攻击骰（D6 / -1 等），
+#           按武器命中、敌人格挡结算后的净命中 × 武器伤害
+# - absorbed：敌人每次反击（d6 次攻击）中被装备额外防御骰直接抵消的命中次数期望
+# - taken：抵消后仍会吃到的伤害期望（未命中数 × 敌人伤害）
+# 按「武器表 sha1 + 敌人表 sha1」算一次，写到 .card_cache/weapon_matrix.pickle；
+# 卡表没变时进程内、跨进程都直接复用，打开商店不再重新计算。
+
+MATRIX_FILE = "weapon_matrix.pickle"
+MATRIX_VERSION = 1
+BASE_ATTACKS = 1   # 每回合默认打出一张 +1 次的攻击卡（与 core.markov 的假设一致）
+
+_matrix = None     # 进程内缓存的 WeaponMatrix
+
+
+class WeaponMatrix:
+    """
+    weapons / enemies：武器名、敌人名元组（行/列顺序）
+    damage / absorbed / taken：行 = 武器，列 = 敌人 的浮点矩阵（元组的元组）
+    """
+    __slots__ = ("version", "weapons", "enemies", "damage", "absorbed", "taken", "_rows", "_cols")
+
+    def __init__(self, version, weapons, enemies, damage, absorbed, taken):
+        self.version = version
+        self.weapons = tuple(weapons)
+        self.enemies = tuple(enemies)
+        self.damage = tuple(tuple(r) for r in damage)
+        self.absorbed = tuple(tuple(r) for r in absorbed)
+        self.taken = tuple(tuple(r) for r in taken)
+        self._rows = {name: i for i, name in enumerate(self.weapons)}
+        self._cols = {name: i for i, name in enumerate(self.enemies)}
+
+    def __getstate__(self):
+        return (self.version, self.weapons, self.enemies, self.damage, self.absorbed, self.taken)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __contains__(self, weapon):
+        return weapon in self._rows
+
+    def stats(self, weapon, enemy=None):
+        """
+        某武器的 (damage, absorbed, taken)；enemy=None 时取全部敌人的平均
+        不在表中的武器返回 None
+        """
+        row = self._rows.get(weapon)
+        if row is None:
+            return None
+        if enemy is not None:
+            col = self._cols.get(enemy)
+            if col is None:
+                return None
+            return self.damage[row][col], self.absorbed[row][col], self.taken[row][col]
+        n = len(self.enemies) or 1
+        return sum(self.damage[row]) / n, sum(self.absorbed[row]) / n, sum(self.taken[row]) / n
+
+    def __repr__(self):
+        return f"WeaponMatrix({len(self.weapons)} 武器 × {len(self.enemies)} 敌人, version={self.version})"
+
+
+# ===================== 计算 =====================
+def weapon_damage(weapon, enemy, attacks=BASE_ATTACKS):
+    """每回合预计伤害（Weapon 记录 × Enemy 记录）"""
+    return prob.expected_damage(attacks, weapon.hit_threshold, enemy.block_threshold,
+                                weapon.damage, weapon.extra_attack)
+
+def weapon_defense(weapon, enemy):
+    """敌人每次反击：(被额外防御骰抵消的命中数期望, 剩余伤害期望)"""
+    hits = prob.net_hits_pmf(0, enemy.hit_threshold, 7, "d6")
+    blocks = prob.dice_pmf(weapon.extra_defense).clamp_min(0)
+    absorbed = taken = 0.0
+    for h, p in hits.items():
+        for b, q in blocks.items():
+            absorbed += p * q * min(h, b)
+            taken += p * q * max(0, h - b)
+    return absorbed, taken * enemy.damage
+
+def build_matrix(weapons, enemies, version=None):
+    """按记录列表计算完整矩阵（相同参数的分布由 core.probability 缓存，不重复卷积）"""
+    damage, absorbed, taken = [], [], []
+    for w in weapons:
+        damage.append([weapon_damage(w, e) for e in enemies])
+        defense = [weapon_defense(w, e) for e in enemies]
+        absorbed.append([a for a, _ in defense])
+        taken.append([t for _, t in defense])
+    return WeaponMatrix(version, [w.name for w in weapons], [e.name for e in enemies],
+                        damage, absorbed, taken)
+
+
+# ===================== 缓存 =====================
+def _catalog_version(weapon_file, enemy_file):
+    # get_xxx 按卡表版本缓存，命中时只 stat 源文件；sha1 取自已打开的二进制卡表，不加载目录快照
+    data.get_weapons(weapon_file)
+    data.get_enemies(enemy_file)
+    return (MATRIX_VERSION, data.table_version(weapon_file), data.table_version(enemy_file))
+
+def _load_cached(path, version):
+    try:
+        with open(path, "rb") as f:
+            matrix = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError, TypeError):
+        return None
+    return matrix if isinstance(matrix, WeaponMatrix) and matrix.version == version else None
+
+def _save(path, matrix):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(matrix, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ 武器分析缓存写入失败：{e}")
+
+def weapon_matrix(weapon_file="weapon.csv", enemy_file="enemycharacter.csv"):
+    """
+    取武器×敌人分析表：卡表版本没变时直接返回缓存（进程内 → 磁盘），否则重新计算并写盘
+    卡表缺失/格式错误时抛出 core.data.CardDataError
+    """
+    global _matrix
+    try:
+        version = _catalog_version(weapon_file, enemy_file)
+    except data.CardDataError:
+        raise
+    except FileNotFoundError as e:
+        raise data.MissingCardFileError(f"未找到卡表文件：{e.filename}", e.filename) from None
+    except (OSError, ValueError, UnicodeDecodeError, EOFError, pickle.PickleError, struct.error) as e:
+        # 卡表编码错误、目录快照/二进制卡表损坏等：和 core.data._open 一样归为格式错误
+        raise data.CardFormatError(f"读取卡表失败：{e}", getattr(e, "filename", None)) from e
+    if _matrix is not None and _matrix.version == version:
+        return _matrix
+    path = os.path.join(catalog.get_cache_dir(), MATRIX_FILE)
+    matrix = _load_cached(path, version)
+    if matrix is None:
+        enemies = data.get_enemies(enemy_file)
+        matrix = build_matrix(data.get_weapons(weapon_file), list(enemies.values()), version)
+        _save(path, matrix)
+    _matrix = matrix
+    return matrix
@@ -0,0 +1,574 @@
+from core import battlelog as log
+from core import dice
+from core.deck import Deck
+from core import rng as rngs
+from core.records import ActionCard
+from core.util import safe_int, parse_check_condition
+
+# ===================== 无界面战斗规则引擎 =====================
+# 原先的规则写在 battle_core.create_battle_ui 的闭包里，和 Tk 控件、after 延时链、
+# 模块全局变量（PLAYER_HAND 等）缠在一起。这里把状态放进 BattleEngine，
+# 每个玩家操作是一个同步的步进函数，一场战斗可以在微秒级跑完：
+#   engine.start()
+#   出牌阶段：play_card(i) / skip_play()   → 结算玩家攻击、NPC格挡、NPC反击，进入反应阶段
+#   反应阶段：play_react_card(i) / skip_react() → 结算伤害，进入下一回合出牌阶段
+# phase 为 OVER 时 outcome 给出结果。Tk 窗口（battle_core）只负责显示和转发点击；
+# 自动结算/AI/模拟直接调用 run(policy)。
+
+PLAY = "play"
+REACT = "react"
+OVER = "over"
+
+WIN = "win"
+LOSE = "lose"
+STALEMATE = "stalemate"
+ROUND_CAP = "round_cap"
+
+DECK_SIZE = 16
+MAX_ROUNDS = 200        # 回合上限：到达后按 ROUND_CAP 结束
+STALEMATE_ROUNDS = 30   # 连续这么多回合双方生命都没变化，判定为僵局
+HAND_SIZE = 4
+START_ENERGY = 10
+
+REACT_TYPES = ("防御", "移动", "能量")
+
+# 卡牌记录不可变：牌库/手牌/弃牌堆中放的都是同一对象的引用
+DEFAULT_CARDS = (
+    ActionCard(1, "步行", "移动", 0, 1, 0, 0, 0, 4, "基础移动卡", 2),
+    ActionCard(5, "轻击", "伤害", 0, 0, 1, 0, 0, 4, "基础伤害卡", 2),
+    ActionCard(9, "木盾", "防御", 0, 0, 0, 1, 0, 4, "基础防御卡", 2),
+    ActionCard(13, "小型魔力源", "能量", 1, 0, 0, 0, 1, 4, "基础能量卡", 2),
+)
+BASIC_ATTACK = ActionCard(5, "轻击", "伤害", 0, 0, 1, 0, 0, 1, "基础伤害卡", 2)
+
+
+# ===================== 组牌 =====================
+def build_deck(cards, size=DECK_SIZE):
+    """
+    由已购卡牌（每张一份的 ActionCard 列表）组成战斗牌库（未洗牌），恰好 size 张：
+    - 没有已购卡牌时使用 DEFAULT_CARDS（各按持有数量）
+    - 同编号的卡排在一起（按首次出现顺序），超出 size 的部分丢弃
+    - 不足 size 张用轻击补齐
+    """
+    if cards:
+        groups = {}
+        for card in cards:
+            group = groups.get(card.id)
+            if group is None:
+                groups[card.id] = [card, 1]
+            else:
+                group[1] += 1
+        ordered = [card for card, n in groups.values() for _ in range(n)]
+    else:
+        ordered = [card for card in DEFAULT_CARDS for _ in range(card.count)]
+    deck = ordered[:size]
+    deck.extend([BASIC_ATTACK] * (size - len(deck)))
+    return deck
+
+
+# ===================== 阈值 =====================
+def adjusted_threshold(base_check, stat):
+    """
+    最终阈值 = 装备基础阈值 - (属性 // 2)，限制在 2+ ~ 6+
+    闪避用敏捷，格挡用力量
+    """
+    return max(2, min(6, parse_check_condition(base_check) - safe_int(stat) // 2))
+
+
+class PlayerLoadout:
+    """一场战斗中玩家的固定参数（角色 + 武器），开战时算好，战斗中不变"""
+    __slots__ = ("name", "hp", "weapon", "base_damage", "hit_check", "hit_threshold",
+                 "dodge_threshold", "block_threshold", "extra_attack_str", "extra_defense_str",
+                 "extra_attack_dice", "extra_defense_dice")
+
+    def __init__(self, name, hp, weapon="基础长剑", base_damage=2, hit_check="3+",
+                 dodge_threshold=3, block_threshold=3, extra_attack="0", extra_defense="0"):
+        self.name = name
+        self.hp = hp
+        self.weapon = weapon
+        self.base_damage = safe_int(base_damage)
+        self.hit_check = hit_check
+        self.hit_threshold = parse_check_condition(hit_check)
+        self.dodge_threshold = dodge_threshold
+        self.block_threshold = block_threshold
+        self.extra_attack_str = str(extra_attack or "0")
+        self.extra_defense_str = str(extra_defense or "0")
+        self.extra_attack_dice = dice.dice_or_zero(extra_attack)
+        self.extra_defense_dice = dice.dice_or_zero(extra_defense)
+
+def build_player(name, hp, attributes, weapon=None):
+    """
+    由角色属性和武器（Weapon 记录，None=基础长剑）生成 PlayerLoadout
+    闪避阈值 = 武器闪避(默认3+) - 敏捷//2；格挡阈值 = 武器格挡 - 力量//2
+    """
+    agility = attributes.get("Agility", 6)
+    strength = attributes.get("Strength", 6)
+    if weapon is None:
+        return PlayerLoadout(name, hp, dodge_threshold=adjusted_threshold("3+", agility),
+                             block_threshold=adjusted_threshold("3+", strength))
+    return PlayerLoadout(
+        name, hp, weapon.name, weapon.damage, weapon.hit,
+        adjusted_threshold(weapon.get("闪避", "3+"), agility),
+        adjusted_threshold(weapon.block, strength),
+        weapon.extra_attack, weapon.extra_defense,
+    )
+
+
+# ===================== 卡牌效果 =====================
+def resolve_card(card, energy, dodge_threshold, block_threshold, rng=None, verbose=True):
+    """
+    结算一张卡牌的能量消耗和次数加成，返回 (是否生效, 剩余能量, 倍数, 次数加成, 说明列表)
+    - 能量不足：不生效，能量不变
+    - 能量卡：倍数 = 能量增益（至少1）
+    - 闪避/格挡卡：按阈值逐个掷骰，加成为成功次数
+    - 攻击卡：加成为伤害值
+    verbose=False 时不生成说明文本、不保留骰子点数（模拟用）；掷骰本身与 verbose 无关
+    """
+    msg = []
+    cost = card.cost
+    if cost > energy:
+        if verbose:
+            msg.append(f"能量不足！需要{cost}，当前{energy}")
+        return False, energy, 1, card.bonus, msg
+
+    energy -= cost
+    if verbose:
+        msg.append(f"消耗{cost}能量（剩余：{energy}）")
+
+    card_type = card.card_type
+    if card_type == "能量":
+        return True, energy, card.energy_gain if card.energy_gain > 0 else 1, card.bonus, msg
+
+    bonus = 0
+    if card_type == "移动" or card_type == "防御":
+        label = "闪避" if card_type == "移动" else "格挡"
+        threshold = dodge_threshold if card_type == "移动" else block_threshold
+        result = dice.roll_checks(card.bonus, threshold, rng=rng, keep_rolls=verbose)
+        bonus = result.hits
+        if verbose:
+            msg.append(str(result.describe(label, f"需要{threshold}+")))
+            msg.append(f"最终生效{label}次数：{bonus}")
+    elif card_type == "伤害":
+        bonus = card.bonus
+        if verbose:
+            msg.append(f"攻击次数 +{bonus}")
+    return True, energy, 1, bonus, msg
+
+
+# ===================== 战斗引擎 =====================
+class BattleEngine:
+    def __init__(self, player, enemy, count, deck, *, shuffle=False, energy=START_ENERGY,
+                 hand_size=HAND_SIZE, max_rounds=MAX_ROUNDS, stalemate_rounds=STALEMATE_ROUNDS,
+                 player_rng=None, npc_rng=None, shuffle_rng=None, on_log=None, on_event=None):
+        """
+        player：PlayerLoadout；enemy：Enemy 记录；count：敌人数量
+        deck：开局牌库——卡牌记录序列（按抽牌顺序）或 core.deck.Deck（直接使用）；shuffle=True 时开局先洗一次
+              打出的牌和回合末剩余手牌进弃牌堆，抽空后洗回
+        hand：手牌是卡牌编号列表，用 card_at(i) / hand_cards() 取记录
+        hand_size：每回合补到的手牌数
+        on_log：日志回调 on_log(级别, 格式串, 参数)，文本由接收方需要时再格式化（见 core.battlelog）；
+                None=不生成日志
+        on_event：结构化事件回调 on_event(事件类型, 回合, 字段字典)（见 core.eventlog）；None=不生成事件
+        """
+        self.player = player
+        self.enemy = enemy
+        self.count = count
+        self.hand_size = hand_size
+        self.max_rounds = max_rounds
+        self.stalemate_rounds = stalemate_rounds
+        self.player_rng = player_rng or rngs.stream(rngs.PLAYER_DICE)
+        self.npc_rng = npc_rng or rngs.stream(rngs.NPC_DICE)
+        self.shuffle_rng = shuffle_rng or rngs.stream(rngs.DECK_SHUFFLE)
+        self.on_log = on_log
+        self.on_event = on_event
+
+        self.player_hp = player.hp
+        self.npc_hp = enemy.hp * count
+        self.energy = energy
+        self.next_attack_multiply = 1   # 下一回合攻击倍数
+        self.defense_multiply = 1       # 本回合防御倍数
+        self.energy_used = False        # 本回合是否已用能量卡
+        self.attack_times = 0
+        self.block_times = 0
+        self.dodge_times = 0
+        self.npc_attack_times = 0
+        self.npc_hits = 0
+
+        if not isinstance(deck, Deck):
+            deck = Deck(deck or (BASIC_ATTACK,), self.shuffle_rng)
+        if shuffle:
+            deck.shuffle()
+        self.deck = deck
+        self.hand = []
+
+        self.round_num = 1
+        self.phase = PLAY
+        self.outcome = None
+        self.started = False
+        self._quiet_rounds = 0
+        self._round_hp = (self.player_hp, self.npc_hp)
+
+    # ---------- 日志 ----------
+    def _log(self, fmt, *args):
+        """只交出格式串和参数，不在引擎里格式化"""
+        if self.on_log is not None:
+            self.on_log(log.INFO, fmt, args)
+
+    def _detail(self, fmt, *args):
+        if self.on_log is not None:
+            self.on_log(log.DETAIL, fmt, args)
+
+    def _summary(self, fmt, *args):
+        if self.on_log is not None:
+            self.on_log(log.SUMMARY, fmt, args)
+
+    def _event(self, event_type, **fields):
+        if self.on_event is not None:
+            self.on_event(event_type, self.round_num, fields)
+
+    def _dice_event(self, label, result):
+        if self.on_event is not None:
+            self.on_event("dice", self.round_num, {
+                "label": label, "count": result.count, "threshold": result.threshold, "hits": result.hits,
+                "rolls": list(result.rolls) if result.rolls is not None else None})
+
+    @property
+    def over(self):
+        return self.phase == OVER
+
+    @property
+    def _record_rolls(self):
+        """是否保留逐骰点数给日志/事件（只影响记录，掷骰规则和随机数消耗与它无关）"""
+        return self.on_log is not None or self.on_event is not None
+
+    def _enter_phase(self, phase):
+        self.phase = phase
+        self._event("phase", phase=phase)
+
+    def _finish(self, outcome, line):
+        self.phase = OVER
+        self.outcome = outcome
+        self._summary(line)
+        self._event("end", outcome=outcome, player_hp=self.player_hp, npc_hp=self.npc_hp, rounds=self.round_num)
+
+    # ---------- 牌库 ----------
+    def card_at(self, index):
+        return self.deck.card(self.hand[index])
+
+    def hand_cards(self):
+        """手牌的卡牌记录列表（显示/策略用）"""
+        card = self.deck.card
+        return [card(cid) for cid in self.hand]
+
+    def _draw_hand(self):
+        """上回合剩下的手牌进弃牌堆，再补满手牌"""
+        self.deck.discard_hand(self.hand)
+        self.deck.draw_into(self.hand, self.hand_size)
+
+    def _reset_times(self):
+        self.attack_times = 0
+        self.block_times = 0
+        self.dodge_times = 0
+        self.npc_hits = 0
+        self.energy_used = False
+
+    # ---------- 开局 ----------
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        p = self.player
+        self._summary("🔥 战斗开始！对手：{}个{} | NPC总生命：{}", self.count, self.enemy.name, self.npc_hp)
+        self._event("start", player=p.name, weapon=p.weapon, player_hp=self.player_hp, energy=self.energy,
+                    enemy=self.enemy.name, count=self.count, npc_hp=self.npc_hp,
+                    deck_size=len(self.deck) + len(self.deck.discard))
+        self._log("🎮 玩家：{} | 生命{} | 能量{}", p.name, self.player_hp, self.energy)
+        self._log("⚔️ 装备：{} | 单次伤害{}", p.weapon, p.base_damage)
+        self._log("🎲 攻击判定{} | 闪避{}+ | 格挡{}+", p.hit_check, p.dodge_threshold, p.block_threshold)
+        self._detail("📌 装备加成：攻击({}) 格挡({})（战斗中实时掷骰）", p.extra_attack_str, p.extra_defense_str)
+        self._detail("🔋 攻击倍数×{} | 防御倍数×{}", self.next_attack_multiply, self.defense_multiply)
+        self._log("📢 请选择卡牌使用，或点击「跳过出牌阶段」")
+        self._draw_hand()
+        self._reset_times()
+        self._enter_phase(PLAY)
+        if p.base_damage <= 0 and self.enemy.damage <= 0:
+            self._finish(STALEMATE, "⏸️ 双方都无法造成伤害，战斗以僵局结束")
+
+    # ---------- 出牌阶段 ----------
+    def play_options(self):
+        """出牌阶段可尝试的手牌下标（攻击卡/未用过的能量卡）"""
+        return [i for i, c in enumerate(self.hand_cards())
+                if c.card_type not in ("防御", "移动") and not (c.card_type == "能量" and self.energy_used)]
+
+    def play_card(self, index):
+        """出牌阶段打出一张牌；被拒绝（阶段不对/类型不允许/能量不足）返回 False，卡牌留在手中"""
+        if self.phase != PLAY or not 0 <= index < len(self.hand):
+            return False
+        card = self.card_at(index)
+        card_type = card.card_type
+
+        if card_type == "能量" and self.energy_used:
+            self._summary("❌ 本阶段已使用能量卡，禁止再次使用！卡牌已退回")
+            return False
+        if card_type in ("防御", "移动"):
+            self._summary("❌ 出牌阶段禁止使用防御/闪避牌！卡牌已退回")
+            return False
+
+        ok, self.energy, mul, bonus, msg = resolve_card(
+            card, self.energy, self.player.dodge_threshold, self.player.block_threshold,
+            self.player_rng, self.on_log is not None)
+        self._log("✅ 使用卡牌：【{}】", card.name)
+        self._detail("🎯 卡牌效果：{}", "; ".join(msg))
+        self._event("card", phase=PLAY, id=card.id, name=card.name, card_type=card_type, ok=ok,
+                    energy=self.energy, bonus=bonus, multiply=mul)
+        if not ok:
+            return False
+
+        self.deck.discard_card(self.hand.pop(index))
+        if card_type == "能量":
+            self.defense_multiply = mul
+            self.energy_used = True
+            self._log("🔋 能量牌生效！本回合防御加成 ×{} 倍", mul)
+        elif card_type == "伤害":
+            actual = bonus * self.next_attack_multiply
+            if actual > 0:
+                self.attack_times += actual
+                self._log("⚔️ 攻击次数 +{}（×{}倍） | 当前：{}", actual, self.next_attack_multiply, self.attack_times)
+        self._detail("----- 出牌结束 -----")
+        self._attack_phase()
+        return True
+
+    def skip_play(self):
+        if self.phase != PLAY:
+            self._summary("❌ 当前无法跳过出牌阶段！")
+            return False
+        self._log("📢 玩家跳过出牌阶段，进入攻击判定！")
+        self._attack_phase()
+        return True
+
+    # ---------- 玩家攻击 / NPC格挡 ----------
+    def _attack_phase(self):
+        p = self.player
+        # 装备额外攻击次数（每次攻击实时掷骰，负值减少次数）
+        extra = p.extra_attack_dice(self.player_rng)
+        self._event("weapon_dice", kind="attack", expr=p.extra_attack_str, value=extra)
+        if extra != 0:
+            self.attack_times = max(0, self.attack_times + extra)
+            self._log("⚔️ 装备【{}】额外攻击 {:+d} 次（{} 本次掷骰结果）！当前总攻击次数: {}",
+                      p.weapon, extra, p.extra_attack_str, self.attack_times)
+
+        if self.attack_times <= 0:
+            self._summary("⚠️ 玩家无攻击次数，跳过攻击")
+            self._npc_counter_attack()
+            return
+
+        self._log("===== 玩家攻击阶段 ===== | 总攻击次数: {} | 攻击倍数: ×{}",
+                  self.attack_times, self.next_attack_multiply)
+        verbose = self.on_log is not None
+        result = dice.roll_checks(self.attack_times, p.hit_threshold, rng=self.player_rng, keep_rolls=self._record_rolls)
+        self._dice_event("player_attack", result)
+        if verbose:
+            self._detail(result.describe("攻击", f"命中判定{p.hit_check}", "命中", "未命中"))
+        if result.hits == 0:
+            self._summary("❌ 所有攻击均未命中！")
+        else:
+            self._log("✅ 成功命中 {} 次！进入NPC格挡判定", result.hits)
+        self._npc_block_phase(result.hits)
+
+    def _npc_block_phase(self, player_hits):
+        enemy = self.enemy
+        verbose = self.on_log is not None
+        result = dice.roll_checks(player_hits, enemy.block_threshold, rng=self.npc_rng, keep_rolls=self._record_rolls)
+        if player_hits > 0:
+            self._dice_event("npc_block", result)
+        if verbose and player_hits > 0:
+            self._detail(result.describe("NPC格挡", f"格挡判定{enemy.block_check}", "格挡成功", "失败"))
+
+        damage_times = player_hits - result.hits
+        total_damage = damage_times * self.player.base_damage * self.next_attack_multiply
+        self._event("damage", target="npc", hits=damage_times, amount=total_damage,
+                    multiply=self.next_attack_multiply, hp=max(self.npc_hp - total_damage, 0))
+        if damage_times > 0:
+            self.npc_hp -= total_damage
+            self._summary("💥 NPC被击中 {} 次！造成 {} 点伤害（×{}倍） | 剩余生命: {}",
+                      damage_times, total_damage, self.next_attack_multiply, max(self.npc_hp, 0))
+        else:
+            self._summary("🛡️ NPC成功格挡所有攻击！")
+
+        self.next_attack_multiply = 1
+        self._detail("🔋 攻击倍数已重置为 ×1（攻击阶段结束）")
+
+        if self.npc_hp <= 0:
+            self._finish(WIN, "🎉 所有敌人已被击败！战斗胜利！")
+            return
+        self._npc_counter_attack()
+
+    # ---------- NPC反击 ----------
+    def _npc_counter_attack(self):
+        enemy = self.enemy
+        self._log("===== NPC反击阶段 =====")
+        self.npc_attack_times = int(self.npc_rng.random() * 6) + 1
+        self._summary("👹 {} 发起 {} 次攻击！", enemy.name, self.npc_attack_times)
+
+        verbose = self.on_log is not None
+        result = dice.roll_checks(self.npc_attack_times, enemy.hit_threshold, rng=self.npc_rng, keep_rolls=self._record_rolls)
+        self._dice_event("npc_attack", result)
+        self.npc_hits = result.hits
+        if verbose:
+            self._detail(result.describe("NPC攻击", f"命中判定{enemy.hit_check}", "命中", "未命中"))
+        self._log("⚠️ 进入玩家反应阶段（NPC实际命中 {} 次）", self.npc_hits)
+        self._enter_phase(REACT)
+
+        # 装备额外防御次数（每次反击实时掷骰，负值减少次数）
+        p = self.player
+        extra = p.extra_defense_dice(self.player_rng)
+        self._event("weapon_dice", kind="defense", expr=p.extra_defense_str, value=extra)
+        if extra != 0:
+            self.block_times = max(0, self.block_times + extra)
+            self._log("🛡️ 装备【{}】额外格挡 {:+d} 次（{} 本次掷骰结果）！当前总格挡次数: {}",
+                      p.weapon, extra, p.extra_defense_str, self.block_times)
+
+        if not any(c.card_type in REACT_TYPES for c in self.hand_cards()):
+            self._log("⚠️ 无可用的防御/闪避/能量卡！请点击跳过反应阶段")
+        else:
+            self._log("🟡 请打出1张反应卡，或点击「跳过反应阶段」")
+
+    # ---------- 反应阶段 ----------
+    def react_options(self):
+        """反应阶段可尝试的手牌下标（防御/闪避/未用过的能量卡）"""
+        return [i for i, c in enumerate(self.hand_cards())
+                if c.card_type in REACT_TYPES and not (c.card_type == "能量" and self.energy_used)]
+
+    def play_react_card(self, index):
+        """反应阶段打出一张牌；被拒绝返回 False，卡牌留在手中"""
+        if self.phase != REACT or not 0 <= index < len(self.hand):
+            return False
+        card = self.card_at(index)
+        card_type = card.card_type
+
+        if card_type == "能量" and self.energy_used:
+            self._summary("❌ 本阶段已使用能量卡，禁止再次使用！卡牌已退回")
+            return False
+        if card_type == "伤害":
+            self._summary("❌ 反应阶段禁止使用攻击牌！卡牌已退回")
+            return False
+        if card_type not in REACT_TYPES:
+            self._summary("❌ 反应阶段仅可使用防御/闪避/能量卡！卡牌已退回")
+            return False
+
+        ok, self.energy, mul, bonus, msg = resolve_card(
+            card, self.energy, self.player.dodge_threshold, self.player.block_threshold,
+            self.player_rng, self.on_log is not None)
+        self._event("card", phase=REACT, id=card.id, name=card.name, card_type=card_type, ok=ok,
+                    energy=self.energy, bonus=bonus, multiply=mul)
+        if not ok:
+            self._summary("❌ {}！卡牌已退回", "; ".join(msg))
+            return False
+
+        self.deck.discard_card(self.hand.pop(index))
+        self._log("✅ 反应阶段使用：【{}】", card.name)
+        self._detail("🎯 卡牌效果：{}", "; ".join(msg))
+
+        if card_type == "能量":
+            self.next_attack_multiply = mul
+            self.energy_used = True
+            self._log("🔋 能量牌生效！下一回合攻击阶段次数加成 ×{} 倍（仅单次生效）", mul)
+        else:
+            actual = bonus * self.defense_multiply
+            if actual > 0:
+                if card_type == "防御":
+                    self.block_times += actual
+                    self._log("🛡️ 反应格挡次数增加 {} 次（×{}倍） | 当前格挡次数: {}",
+                              actual, self.defense_multiply, self.block_times)
+                else:
+                    self.dodge_times += actual
+                    self._log("✨ 反应闪避次数增加 {} 次（×{}倍） | 当前闪避次数: {}",
+                              actual, self.defense_multiply, self.dodge_times)
+        self._detail("----- 反应阶段结束 -----")
+        self._calculate_damage()
+        return True
+
+    def skip_react(self):
+        if self.phase != REACT:
+            self._summary("❌ 当前无法跳过反应阶段！")
+            return False
+        self._log("📢 玩家跳过反应阶段，进入伤害结算！")
+        self._calculate_damage()
+        return True
+
+    # ---------- 伤害结算 / 回合推进 ----------
+    def _calculate_damage(self):
+        total_defense = self.dodge_times + self.block_times
+        defended = min(total_defense, self.npc_hits)
+        damage_times = self.npc_hits - defended
+        self._detail("🛡️ 玩家最终防御：闪避{} + 格挡{} = {} 次", self.dodge_times, self.block_times, total_defense)
+        if defended > 0:
+            self._log("✅ 玩家成功防御 {} 次", defended)
+        total_damage = damage_times * self.enemy.damage
+        self._event("damage", target="player", hits=damage_times, amount=total_damage,
+                    defended=defended, hp=self.player_hp - total_damage)
+        if damage_times > 0:
+            self.player_hp -= total_damage
+            self._summary("💥 玩家被击中 {} 次！受到 {} 点伤害 | 剩余生命: {}", damage_times, total_damage, self.player_hp)
+        else:
+            self._summary("✨ 玩家成功防御所有攻击！无伤")
+
+        self.defense_multiply = 1
+        self._detail("🔋 防御倍数已重置为 ×1（反应结算完成）")
+
+        if self.player_hp <= 0:
+            self._finish(LOSE, "💀 玩家生命值为0！战斗失败！")
+        elif self.npc_hp <= 0:
+            self._finish(WIN, "🎉 所有敌人已被击败！战斗胜利！")
+        else:
+            self._next_round()
+
+    def _next_round(self):
+        hp = (self.player_hp, self.npc_hp)
+        self._quiet_rounds = self._quiet_rounds + 1 if hp == self._round_hp else 0
+        self._round_hp = hp
+        if self._quiet_rounds >= self.stalemate_rounds:
+            self._finish(STALEMATE, f"⏸️ 连续{self._quiet_rounds}回合双方生命未变化，战斗以僵局结束")
+            return
+        if self.round_num >= self.max_rounds:
+            self._finish(ROUND_CAP, f"⏱️ 已达到回合上限（{self.max_rounds}回合），战斗结束")
+            return
+
+        self.round_num += 1
+        self._reset_times()
+        self._draw_hand()
+        self._enter_phase(PLAY)
+
+        p = self.player
+        self._summary("===== 第{}回合开始 =====", self.round_num)
+        self._detail("🔋 初始状态 - 下回合攻击倍数: ×{} | 本回合防御倍数: ×{}", self.next_attack_multiply, self.defense_multiply)
+        self._detail("🎲 本回合阈值 - 闪避{}+ | 格挡{}+", p.dodge_threshold, p.block_threshold)
+        self._detail("📌 装备加成：攻击({}) 格挡({})（实时掷骰）", p.extra_attack_str, p.extra_defense_str)
+        self._log("📢 请选择卡牌使用，或点击「跳过出牌阶段」")
+
+    # ---------- 自动结算 ----------
+    def run(self, policy=None):
+        """按策略自动打完整场战斗，返回 outcome；policy(engine) 返回要打出的手牌下标或 None（跳过）"""
+        policy = policy or greedy_policy
+        self.start()
+        while self.phase != OVER:
+            index = policy(self)
+            if self.phase == PLAY:
+                if index is None or not self.play_card(index):
+                    self.skip_play()
+            elif index is None or not self.play_react_card(index):
+                self.skip_react()
+        return self.outcome
+
+
+def greedy_policy(engine):
+    """默认策略：出牌阶段打加成最高且能量够的攻击卡；反应阶段打加成最高且能量够的闪避/格挡卡"""
+    if engine.phase == PLAY:
+        wanted = ("伤害",)
+    else:
+        wanted = ("防御", "移动")
+    best, best_bonus = None, 0
+    for i, card in enumerate(engine.hand_cards()):
+        if card.card_type in wanted and card.cost <= engine.energy and card.bonus > best_bonus:
+            best, best_bonus = i, card.bonus
+    return best
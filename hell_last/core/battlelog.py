@@ -0,0 +1,176 @@
+import os
+import tempfile
+from array import array
+from collections import deque
+
+# ===================== 战斗日志管线（无界面部分） =====================
+# 引擎通过 on_log(level, fmt, args) 交出日志：只存格式串和参数，真正显示时才格式化，
+# 被级别/摘要模式过滤掉、或被「跳到最新」丢弃的日志从不生成文本。
+# 待显示的日志放在 deque 里，界面每帧用 take(n) 取一批一次性插入 Text，
+# 播放速度由帧数决定，不再是「行数 × 固定延时」。
+# 级别：
+#   DETAIL  —— 掷骰明细、倍数重置等过程信息
+#   INFO    —— 出牌、阶段提示（默认显示到这一级）
+#   SUMMARY —— 每个阶段的结果（造成/受到伤害、回合开始、胜负）；摘要模式只显示这一级
+
+DETAIL = 10
+INFO = 20
+SUMMARY = 30
+
+LEVEL_NAMES = {DETAIL: "明细", INFO: "信息", SUMMARY: "摘要"}
+SKIP_NOTICE = "⏩ 已跳过 {} 条日志"
+
+
+def format_log(fmt, args):
+    """格式串 + 参数 -> 文本（fmt 也可以是 CheckLog 这类自带 __str__ 的对象）"""
+    return str(fmt).format(*args) if args else str(fmt)
+
+
+class LogEntry:
+    __slots__ = ("round", "level", "fmt", "args")
+
+    def __init__(self, round_no, level, fmt, args=()):
+        self.round = round_no
+        self.level = level
+        self.fmt = fmt
+        self.args = args
+
+    @property
+    def text(self):
+        return format_log(self.fmt, self.args)
+
+    def __str__(self):
+        return f"【第{self.round}回合】{self.text}".replace("\n", " ")  # 一条日志占一行（日志控件按行号裁剪）
+
+
+class LogPipeline:
+    def __init__(self, level=INFO, summary=False):
+        self.level = level
+        self.summary = summary
+        self.pending = deque()
+        self.skipped = 0   # 「跳到最新」累计丢弃的条数
+
+    @property
+    def threshold(self):
+        return SUMMARY if self.summary else self.level
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, round_no, level, fmt, args=()):
+        """收下一条日志（低于当前级别的直接丢弃，不格式化）"""
+        if level >= self.threshold:
+            self.pending.append(LogEntry(round_no, level, fmt, args))
+
+    def set_summary(self, summary):
+        """切换摘要模式；打开时同时丢掉队列里不够级别的日志"""
+        self.summary = summary
+        if summary:
+            threshold = self.threshold
+            self.pending = deque(e for e in self.pending if e.level >= threshold)
+
+    def take(self, n):
+        """取出最多 n 条待显示的日志（已格式化的文本列表）"""
+        pending = self.pending
+        return [str(pending.popleft()) for _ in range(min(n, len(pending)))]
+
+    def skip_to_latest(self, keep=0, round_no=None):
+        """
+        快进：丢弃队列中除最后 keep 条以外的日志（摘要级日志保留），返回丢弃的条数
+        round_no 不为 None 且确有丢弃时，在队首补一条摘要级提示「已跳过 N 条日志」
+        """
+        pending = self.pending
+        tail = [pending.pop() for _ in range(min(keep, len(pending)))]
+        kept = [e for e in pending if e.level >= SUMMARY]
+        dropped = len(pending) - len(kept)
+        pending.clear()
+        pending.extend(kept)
+        pending.extend(reversed(tail))
+        self.skipped += dropped
+        if dropped and round_no is not None and SUMMARY >= self.threshold:
+            pending.appendleft(LogEntry(round_no, SUMMARY, SKIP_NOTICE, (dropped,)))
+        return dropped
+
+
+# ===================== 有界日志视图（环形缓冲 + 归档） =====================
+# 日志控件只保留最后 capacity 行（环形缓冲）；挤出去的旧行进 LogArchive：
+# 先放内存，超过 memory_lines 后整体写入临时文件，只在内存里留每行的偏移，按页读回。
+# 长战斗/自动战斗时控件行数和内存都有上限，每次插入的开销不随战斗长度增长。
+
+class LogArchive:
+    def __init__(self, memory_lines=5000):
+        self.memory_lines = memory_lines
+        self._mem = []           # 还没写盘的旧行
+        self._file = None        # 临时文件（utf-8，每行一条）
+        self._offsets = array("Q")   # 已写盘各行的起始偏移（最后多一个文件末尾）
+
+    def __len__(self):
+        return max(0, len(self._offsets) - 1) + len(self._mem)
+
+    def extend(self, lines):
+        self._mem.extend(lines)
+        if len(self._mem) >= self.memory_lines:
+            self._spill()
+
+    def _spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile("w+b")
+            self._offsets.append(0)
+        f = self._file
+        f.seek(0, os.SEEK_END)
+        pos = self._offsets[-1]
+        chunk = bytearray()
+        for line in self._mem:
+            data = line.encode("utf-8") + b"\n"
+            chunk += data
+            pos += len(data)
+            self._offsets.append(pos)
+        f.write(chunk)
+        self._mem.clear()
+
+    def page(self, start, stop):
+        """第 [start, stop) 条归档日志（0 = 最早的一条）"""
+        start, stop = max(0, start), min(stop, len(self))
+        if start >= stop:
+            return []
+        on_disk = max(0, len(self._offsets) - 1)
+        lines = []
+        if start < on_disk:
+            end = min(stop, on_disk)
+            f = self._file
+            f.seek(self._offsets[start])
+            raw = f.read(self._offsets[end] - self._offsets[start])
+            lines = raw.decode("utf-8").split("\n")[:end - start]
+        if stop > on_disk:
+            lines.extend(self._mem[max(0, start - on_disk):stop - on_disk])
+        return lines
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._mem.clear()
+        self._offsets = array("Q")
+
+
+class RingLog:
+    """控件中可见的最后 capacity 行；append 返回被挤出（需要从控件顶部删掉）的行数"""
+    def __init__(self, capacity=500, archive=None):
+        self.capacity = capacity
+        self.lines = deque()
+        self.archive = archive if archive is not None else LogArchive()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def append(self, new_lines):
+        lines = self.lines
+        lines.extend(new_lines)
+        overflow = len(lines) - self.capacity
+        if overflow <= 0:
+            return 0
+        self.archive.extend([lines.popleft() for _ in range(overflow)])
+        return overflow
+
+    def close(self):
+        self.archive.close()
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import pickle
+import sys
+
+from core import csvio
+
+# ===================== 卡牌目录缓存 =====================
+# 所有卡表（地图/通道/事件/敌人/武器/行动卡）共用一份「编译后快照」：
+# - 每张表按 (mtime, 文件大小) 快速校验，变化时再比对内容 sha1
+# - 快照持久化到 .card_cache/catalog.pickle，跨进程、跨调用复用
+# - 各模块的 load_xxx 只做字段映射，不再重复打开/解析 CSV
+
+CARD_TABLES = (
+    "mapcard.csv",
+    "passagecard.csv",
+    "eventcard.csv",
+    "enemycharacter.csv",
+    "weapon.csv",
+    "action_card.csv",
+)
+
+CACHE_DIRNAME = ".card_cache"
+SNAPSHOT_FILE = "catalog.pickle"
+SNAPSHOT_VERSION = 2
+
+_snapshot = None   # {绝对路径: 表条目}，首次使用时从磁盘读取
+_dirty = False     # 快照有更新，需要写回磁盘
+
+
+# ===================== 路径处理（和各模块统一） =====================
+def get_script_dir():
+    """获取卡表所在目录（core 包的上一级；打包成exe时为exe所在目录）"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def safe_path(filename):
+    """拼接绝对路径（已经是绝对路径则原样返回）"""
+    if os.path.isabs(filename):
+        return filename
+    return os.path.join(get_script_dir(), filename)
+
+def get_cache_dir():
+    return os.path.join(get_script_dir(), CACHE_DIRNAME)
+
+
+# ===================== 快照读写 =====================
+def _load_snapshot():
+    global _snapshot
+    if _snapshot is not None:
+        return _snapshot
+    _snapshot = {}
+    path = os.path.join(get_cache_dir(), SNAPSHOT_FILE)
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if isinstance(data, dict) and data.get("version") == SNAPSHOT_VERSION:
+            _snapshot = data.get("tables", {})
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError):
+        # 缓存不存在或已损坏：当作空快照，下次保存时覆盖
+        pass
+    _prune_missing()
+    return _snapshot
+
+def _prune_missing():
+    """去掉源文件已不存在的条目（旧目录、临时文件），下次保存时一并写回"""
+    global _dirty
+    missing = [path for path in _snapshot if not os.path.exists(path)]
+    for path in missing:
+        del _snapshot[path]
+    if missing:
+        _dirty = True
+
+def release_snapshot():
+    """写回有变化的快照后丢掉进程内副本（行数据不再常驻），下次 get_table 时重新读取"""
+    global _snapshot
+    save_snapshot()
+    if not _dirty:
+        _snapshot = None
+
+def save_snapshot():
+    """把有变化的快照写回磁盘（先写临时文件再替换，避免多进程读到半截文件）"""
+    global _dirty
+    if not _dirty or _snapshot is None:
+        return
+    cache_dir = get_cache_dir()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, SNAPSHOT_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "tables": _snapshot}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        _dirty = False
+    except OSError as e:
+        # 只读目录等情况：仅保留进程内缓存
+        print(f"⚠️ 卡牌缓存写入失败：{e}")
+
+
+def _compile_table(path, st, raw, digest):
+    encoding, header, rows = csvio.parse_table(raw)
+    return {
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha1": digest,
+        "encoding": encoding,
+        "header": header,
+        "rows": rows,
+    }
+
+
+# ===================== 对外接口 =====================
+def get_table(filename, save=True):
+    """
+    获取某张卡表的编译结果（字典：header / rows / sha1 ...）
+    - mtime 和大小没变：直接命中快照
+    - 变了但内容 sha1 相同：只刷新 mtime
+    - 内容变了：重新解析并写回快照
+    文件不存在时抛出 FileNotFoundError；save=False 时只更新进程内快照
+    """
+    global _dirty
+    path = os.path.normcase(os.path.abspath(safe_path(filename)))
+    st = os.stat(path)
+    snapshot = _load_snapshot()
+    entry = snapshot.get(path)
+    if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+        return entry
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    if entry and entry["sha1"] == digest:
+        entry["mtime_ns"] = st.st_mtime_ns
+        entry["size"] = st.st_size
+    else:
+        entry = _compile_table(path, st, raw, digest)
+        snapshot[path] = entry
+    _dirty = True
+    if save:
+        save_snapshot()
+    return entry
+
+def load_rows(filename):
+    """返回卡表的行字典列表（每次返回新字典，调用方可以放心修改）"""
+    entry = get_table(filename)
+    header = entry["header"]
+    return [dict(zip(header, row)) for row in entry["rows"]]
+
+def preload(filenames=CARD_TABLES):
+    """启动时一次性编译全部卡表（缺失的表跳过，由各模块自己报错）"""
+    for filename in filenames:
+        try:
+            get_table(filename, save=False)
+        except FileNotFoundError:
+            continue
+    release_snapshot()
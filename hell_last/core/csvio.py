@@ -0,0 +1,86 @@
+import codecs
+import csv
+import io
+import re
+
+# ===================== CSV 读取（一次识别编码，一次解码，流式解析） =====================
+# 以前的做法是依次用 utf-8-sig / gbk / utf-8 打开整份文件重试，最坏要解析三遍。
+# 这里先看开头的字节判断编码，然后用增量解码器边解码边交给 csv.reader，
+# 整个文件只解码一次，不会生成完整的解码副本。
+
+SNIFF_SIZE = 64 * 1024           # 判断编码时最多检查的字节数
+FALLBACK_ENCODING = "gb18030"    # 非 UTF-8 时按国标编码读取（GBK 的超集）
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
+def sniff_encoding(raw):
+    """
+    根据字节内容判断编码：
+    - 有 BOM：按 BOM 对应的编码
+    - 第一段非 ASCII 字节能按 UTF-8 解码：utf-8
+    - 否则：gb18030（兼容 GBK 导出的表）
+    纯 ASCII 文件返回 utf-8
+    """
+    for bom, encoding in _BOMS:
+        if raw.startswith(bom):
+            return encoding
+    m = _NON_ASCII.search(raw)
+    if m is None:
+        return "utf-8"
+    # 从第一个非 ASCII 字节开始取一段做严格校验；末尾可能截断半个字符，final=False 容忍
+    window = raw[m.start():m.start() + SNIFF_SIZE]
+    try:
+        codecs.getincrementaldecoder("utf-8")("strict").decode(window, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+def clean_header(header):
+    """去掉表头的 BOM 和首尾空格"""
+    return tuple(h.strip().replace("\ufeff", "") for h in header)
+
+def iter_rows(stream, encoding):
+    """在二进制流上流式解码并逐行产出 CSV 行（列表）"""
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()
+
+def parse_table(raw):
+    """
+    解析整份 CSV 字节：返回 (编码, 清理后的表头, 行元组列表)
+    - 空行跳过；短行补 ""，长行截断到表头宽度
+    """
+    encoding = sniff_encoding(raw)
+    rows_iter = iter_rows(io.BytesIO(raw), encoding)
+    header = clean_header(next(rows_iter, []))
+    width = len(header)
+    rows = []
+    for row in rows_iter:
+        if not row:
+            continue
+        if len(row) < width:
+            row = row + [""] * (width - len(row))
+        rows.append(tuple(row[:width]))
+    return encoding, header, rows
+
+def read_dicts(path):
+    """
+    流式读取 CSV 文件为行字典（角色卡等不进目录缓存的小表）
+    编码按文件开头 SNIFF_SIZE 字节判断
+    """
+    with open(path, "rb", buffering=SNIFF_SIZE) as f:
+        encoding = sniff_encoding(f.peek(SNIFF_SIZE)[:SNIFF_SIZE])
+        rows_iter = iter_rows(f, encoding)
+        header = clean_header(next(rows_iter, []))
+        width = len(header)
+        for row in rows_iter:
+            if row:
+                yield dict(zip(header, row + [""] * (width - len(row))))
@@ -0,0 +1,215 @@
+import struct
+
+from core import catalog
+from core import csvio
+from core import store
+from core.records import ActionCard, MapCard, PassageCard, EventCard, Enemy, Weapon
+from core.util import safe_int, safe_str
+
+# ===================== 无界面数据层 =====================
+# - 导入时不读盘、不依赖 tkinter，首次调用 get_xxx 时才打开卡表
+# - 出错时抛出 CardDataError（不弹窗、不 sys.exit），由界面层决定如何提示
+# - 返回 core.records 中的 slots 记录，数值字段在这里解析一次
+# - 武器/敌人/行动卡是只读表：按卡表版本缓存记录，重复调用直接复用
+# - 地图/通道/事件卡在探索中会被修改（绑定事件、标记完成）：字段值元组同样按卡表版本缓存，
+#   每次调用只用缓存的元组新建记录对象，不再重新读取整列
+
+class CardDataError(Exception):
+    """卡表读取失败（path：出错的文件路径）"""
+    def __init__(self, message, path=None):
+        super().__init__(message)
+        self.path = path
+
+class MissingCardFileError(CardDataError, FileNotFoundError):
+    """卡表文件不存在"""
+
+class CardFormatError(CardDataError, ValueError):
+    """卡表缺列或数据格式错误"""
+
+
+# ===================== 字段映射（逻辑键 -> CSV列名） =====================
+MAP_CARD_FIELDS = {"name": "地图名", "description": "描述", "effect": "地图效果"}
+EVENT_CARD_FIELDS = {
+    "name": "事件名", "description": "描述", "type": "类型", "effect": "效果",
+    "关键词": "关键词",  # 战斗触发关键词
+    "角色": "角色", "数量": "数量"
+}
+EVENT_CARD_REQUIRED = ("事件名", "描述", "效果", "关键词")
+PASSAGE_CARD_FIELDS = {"name": "通道名", "description": "描述", "effect": "效果"}
+
+ACTION_CARD_FIELDS = {k: k for k in ("编号", "卡名", "卡牌类型", "能量消耗", "移动值", "伤害值",
+                                     "防御值", "能量增益", "持有数量", "描述", "价格")}
+ACTION_CARD_INT_FIELDS = ("编号", "能量消耗", "移动值", "伤害值", "防御值", "能量增益", "持有数量", "价格")
+
+WEAPON_FIELDS = {
+    "编号": "编号",
+    "武器名": "武器名",
+    "额外攻击次数": "额外攻击次数",
+    "命中": "命中 H",          # CSV里是"命中 H"
+    "伤害": "伤害 D",          # CSV里是"伤害 D"
+    "额外防御次数": "额外防御次数 N",  # CSV里是"额外防御次数 N"
+    "格挡": "格挡 E",          # CSV里是"格挡 E"
+    "描述": "描述",
+    "特性": "特性"
+}
+WEAPON_INT_FIELDS = ("编号", "伤害")
+
+ENEMY_FIELD_MAPPING = {  # 字段名映射：兼容中英文
+    "name": ["name", "名称", "敌人名称"],
+    "number": ["number", "编号", "序号"],
+    "hp": ["HP", "hp", "生命值", "生命"],
+    "damage": ["Damage", "damage", "伤害值", "伤害"],
+    "hit_check": ["Hit", "hit", "命中", "命中判定"],
+    "block_check": ["doge", "dodge", "block", "格挡", "闪避", "格挡判定"]
+}
+ENEMY_DEFAULTS = {
+    "number": 1, "hp": 5, "damage": 1,
+    "hit_check": "3+", "block_check": "3+", "base_attack_times": 1
+}
+
+CHARACTER_INT_FIELDS = ("Strength", "Agility", "Toughness", "Influence", "Willpower", "Intelligence")
+CHARACTER_STR_FIELDS = ("装备1", "装备2", "护甲")
+
+_readonly_cache = {}   # {(表名, 文件名): (CardTable, 结果)}；探索卡表缓存的是字段值元组
+
+
+# ===================== 内部工具 =====================
+def _open(filename, label, int_columns=()):
+    path = catalog.safe_path(filename)
+    try:
+        return store.open_table(path, int_columns)
+    except FileNotFoundError:
+        raise MissingCardFileError(f"未找到{label}文件：{path}", path) from None
+    except (OSError, ValueError, UnicodeDecodeError, struct.error) as e:
+        raise CardFormatError(f"读取{label}失败：{e}", path) from e
+
+def _require(table, label, columns, int_columns=()):
+    try:
+        table.require(*columns)
+    except KeyError as e:
+        raise CardFormatError(f"{label}CSV缺少列名：{e}", table.path) from None
+    for col in int_columns:
+        if not table.is_int_column(col):
+            raise CardFormatError(f"{label}CSV的列【{col}】存在非整数数据", table.path)
+
+
+# ===================== 探索卡表（缓存字段值，每次返回新记录） =====================
+def _columns(table, fields):
+    """按字段映射取出各列（列表），缺失的可选列返回 None"""
+    return [list(table.column(col)) if table.has_column(col) else None for col in fields.values()]
+
+def get_map_cards(filename="mapcard.csv"):
+    def build(table):
+        _require(table, "地图", MAP_CARD_FIELDS.values())
+        return tuple(zip(*_columns(table, MAP_CARD_FIELDS)))
+    return [MapCard(*row) for row in _readonly("map", filename, "地图", build)]
+
+def get_event_cards(filename="eventcard.csv"):
+    def build(table):
+        _require(table, "事件", EVENT_CARD_REQUIRED)
+        # 类型/角色/数量 为可选列，缺列时取默认空字符串
+        empty = [""] * len(table)
+        cols = [col if col is not None else empty for col in _columns(table, EVENT_CARD_FIELDS)]
+        return tuple(tuple(safe_str(v) for v in row) for row in zip(*cols))
+    return [EventCard(*row) for row in _readonly("event", filename, "事件", build)]
+
+def get_passage_cards(filename="passagecard.csv"):
+    def build(table):
+        _require(table, "通道", PASSAGE_CARD_FIELDS.values())
+        return tuple(zip(*_columns(table, PASSAGE_CARD_FIELDS)))
+    return [PassageCard(*row) for row in _readonly("passage", filename, "通道", build)]
+
+
+def table_version(filename):
+    """卡表内容的 sha1（来自二进制卡表文件头）；还没打开过时先打开（先用 get_xxx 打开可按声明复用映射）"""
+    table = store.opened(filename) or _open(filename, "卡表")
+    return table.source_sha1
+
+
+# ===================== 只读卡表（按版本缓存） =====================
+def _readonly(kind, filename, label, build, int_columns=()):
+    table = _open(filename, label, int_columns)
+    key = (kind, catalog.safe_path(filename))
+    hit = _readonly_cache.get(key)
+    if hit is not None and hit[0] is table:
+        return hit[1]
+    result = build(table)
+    _readonly_cache[key] = (table, result)
+    return result
+
+def get_action_cards(filename="action_card.csv"):
+    """行动卡：ActionCard 列表（数值列已是 int）"""
+    def build(table):
+        _require(table, "行动卡", ACTION_CARD_FIELDS, ACTION_CARD_INT_FIELDS)
+        return [ActionCard(*row) for row in zip(*_columns(table, ACTION_CARD_FIELDS))]
+    return _readonly("action", filename, "行动卡", build, ACTION_CARD_INT_FIELDS)
+
+def get_weapons(filename="weapon.csv"):
+    """武器：Weapon 列表（编号/伤害为 int，其余保留原文）"""
+    int_columns = [WEAPON_FIELDS[f] for f in WEAPON_INT_FIELDS]
+    def build(table):
+        _require(table, "武器", WEAPON_FIELDS.values(), int_columns)
+        return [Weapon(*(v if isinstance(v, int) else safe_str(v) for v in row))
+                for row in zip(*_columns(table, WEAPON_FIELDS))]
+    return _readonly("weapon", filename, "武器", build, int_columns)
+
+def find_weapon(name, filename="weapon.csv"):
+    for w in get_weapons(filename):
+        if w["武器名"] == name:
+            return w
+    return None
+
+def get_enemies(filename="enemycharacter.csv"):
+    """
+    敌人：{敌人名: Enemy}
+    - 兼容中英文字段名（name/名称, HP/生命值, Damage/伤害值 等）
+    - 缺少名称的行跳过；表里没有的字段取 ENEMY_DEFAULTS
+    - HP/伤害/攻击次数解析为 int，命中/格挡判定预先解析出阈值
+    """
+    def build(table):
+        alias = {}
+        for field_key, possible_fields in ENEMY_FIELD_MAPPING.items():
+            for possible_field in possible_fields:
+                if table.has_column(possible_field):
+                    alias[field_key] = possible_field
+                    break
+        if "name" not in alias:
+            raise CardFormatError("敌人CSV缺少敌人名称列", table.path)
+        enemies = {}
+        for row in table.rows(alias, ENEMY_DEFAULTS):
+            enemy_name = safe_str(row["name"])
+            if enemy_name:
+                enemies[enemy_name] = Enemy(
+                    enemy_name,
+                    safe_int(row["number"], ENEMY_DEFAULTS["number"]),
+                    safe_int(row["hp"], ENEMY_DEFAULTS["hp"]),
+                    safe_int(row["damage"], ENEMY_DEFAULTS["damage"]),
+                    safe_str(row["hit_check"], ENEMY_DEFAULTS["hit_check"]),
+                    safe_str(row["block_check"], ENEMY_DEFAULTS["block_check"]),
+                    safe_int(row["base_attack_times"], ENEMY_DEFAULTS["base_attack_times"]),
+                )
+        return enemies
+    return _readonly("enemy", filename, "敌人", build)
+
+
+# ===================== 角色卡 =====================
+def load_character(filename):
+    """
+    读取角色卡（单行 CSV），返回
+    {"name": 角色名, "attributes": {...}, "max_hp": 50 + 坚韧×2}
+    """
+    path = catalog.safe_path(filename)
+    character = None
+    try:
+        for row in csvio.read_dicts(path):
+            attributes = {k: int(row[k]) for k in CHARACTER_INT_FIELDS}
+            attributes.update({k: row[k].strip() for k in CHARACTER_STR_FIELDS})
+            character = {"name": row["角色名称"].strip(), "attributes": attributes}
+    except FileNotFoundError:
+        raise MissingCardFileError(f"找不到角色文件：{path}", path) from None
+    except (KeyError, ValueError, UnicodeDecodeError) as e:
+        raise CardFormatError(f"读取角色失败：{e}", path) from e
+    if character is None:
+        raise CardFormatError(f"角色文件为空：{path}", path)
+    character["max_hp"] = 50 + character["attributes"].get("Toughness", 0) * 2
+    return character
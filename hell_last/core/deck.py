@@ -0,0 +1,180 @@
+from array import array
+
+from core import rng as rngs
+
+# ===================== 牌库（抽牌堆 + 弃牌堆） =====================
+# 牌库、手牌、弃牌堆里放的都是卡牌编号（小整数），指向一张共享的只读卡表 CardTable：
+# 同一张卡不管持有多少份，只有一个 ActionCard 对象，牌库内存只和「不同的卡」数量有关。
+# 抽牌堆是整数数组加读指针：抽牌只移动指针，O(1)，不 pop(0)、不复制卡牌。
+# 打出的牌和回合结束时剩下的手牌进入弃牌堆；抽牌堆抽空时两个数组互换，
+# 弃牌堆原地洗牌（Fisher–Yates）成为新的抽牌堆，整场战斗不再分配新数组。
+# 单张牌被修改时（modify）才为它登记一个变体编号，卡表本身始终不变。
+# snapshot() 把整个牌库压成一个整数数组，存档/模拟可以直接保存和恢复。
+
+ID_TYPECODE = "H"   # 卡牌编号的数组类型（无符号 16 位）
+
+
+class CardTable:
+    """只读卡表：编号 -> 卡牌记录（相同内容的卡只登记一次）"""
+    __slots__ = ("cards", "_index")
+
+    def __init__(self, cards=()):
+        self.cards = []
+        self._index = {}
+        for card in cards:
+            self._intern(card)
+        self.cards = tuple(self.cards)
+
+    def _intern(self, card):
+        key = tuple(card.values())
+        cid = self._index.get(key)
+        if cid is None:
+            cid = len(self.cards)
+            self._index[key] = cid
+            self.cards.append(card)
+        return cid
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __getitem__(self, cid):
+        return self.cards[cid]
+
+    def id_of(self, card):
+        """卡牌记录 -> 编号；不在表中抛出 KeyError"""
+        return self._index[tuple(card.values())]
+
+    def ids(self, cards):
+        """卡牌记录序列 -> 编号数组"""
+        return array(ID_TYPECODE, (self.id_of(card) for card in cards))
+
+
+class Deck:
+    __slots__ = ("table", "_cards", "_pos", "discard", "rng", "reshuffles", "_variants")
+
+    def __init__(self, cards, rng=None, shuffle=False, table=None):
+        """
+        cards：开局抽牌顺序（shuffle=False 时认为已洗好）；table 为 None 时是卡牌记录，
+               由这些卡建一张卡表，否则是 table 中的编号
+        rng：洗牌用的随机数流（默认 DECK_SHUFFLE 流）
+        """
+        if table is None:
+            cards = list(cards)
+            table = CardTable(cards)
+            cards = table.ids(cards)
+        self.table = table
+        self._cards = array(ID_TYPECODE, cards)
+        self._pos = 0
+        self.discard = array(ID_TYPECODE)
+        self.rng = rng or rngs.stream(rngs.DECK_SHUFFLE)
+        self.reshuffles = 0
+        self._variants = None   # 被修改过的牌：编号 len(table)+i -> 修改后的记录
+        if shuffle:
+            self.shuffle()
+
+    # ---------- 卡牌 ----------
+    def card(self, cid):
+        """编号 -> 卡牌记录"""
+        if cid < len(self.table):
+            return self.table.cards[cid]
+        return self._variants[cid - len(self.table)]
+
+    def modify(self, cid, **changes):
+        """
+        为一张牌生成修改后的变体（changes 用中文列名，如 伤害值=2），返回新编号；
+        调用方用新编号替换手牌/牌库中的那一张，其余同名牌不受影响
+        """
+        card = self.card(cid)
+        fields = card.copy()
+        fields.update(changes)
+        if self._variants is None:
+            self._variants = []
+        self._variants.append(type(card).from_mapping(fields))
+        return len(self.table) + len(self._variants) - 1
+
+    # ---------- 抽牌/弃牌 ----------
+    def _shuffle(self, cards):
+        # 原地 Fisher–Yates：从后往前，每张和 [0, i] 中随机一张交换
+        randbelow = self.rng.randrange
+        for i in range(len(cards) - 1, 0, -1):
+            j = randbelow(i + 1)
+            cards[i], cards[j] = cards[j], cards[i]
+
+    def shuffle(self):
+        """把抽牌堆（未抽的部分）原地洗匀"""
+        if self._pos:
+            del self._cards[:self._pos]
+            self._pos = 0
+        self._shuffle(self._cards)
+
+    def __len__(self):
+        """抽牌堆剩余张数"""
+        return len(self._cards) - self._pos
+
+    @property
+    def draw_pile(self):
+        """抽牌堆剩余的牌（按抽牌顺序的卡牌记录，调试/显示用）"""
+        return tuple(self.card(cid) for cid in self._cards[self._pos:])
+
+    def _recycle(self):
+        """抽牌堆抽空：弃牌堆洗匀后成为新的抽牌堆（两个数组互换，不复制）"""
+        cards = self._cards
+        del cards[:]
+        self._cards, self.discard = self.discard, cards
+        self._pos = 0
+        self._shuffle(self._cards)
+        self.reshuffles += 1
+
+    def draw(self):
+        """抽一张牌的编号；抽牌堆和弃牌堆都空时返回 None"""
+        if self._pos >= len(self._cards):
+            if not self.discard:
+                return None
+            self._recycle()
+        cid = self._cards[self._pos]
+        self._pos += 1
+        return cid
+
+    def draw_into(self, hand, size):
+        """把手牌（编号列表）补到 size 张（牌不够时能抽几张算几张），返回实际抽到的张数"""
+        drawn = 0
+        while len(hand) < size:
+            cid = self.draw()
+            if cid is None:
+                break
+            hand.append(cid)
+            drawn += 1
+        return drawn
+
+    def discard_card(self, cid):
+        self.discard.append(cid)
+
+    def discard_hand(self, hand):
+        """手牌全部进入弃牌堆（原地清空 hand）"""
+        self.discard.extend(hand)
+        hand.clear()
+
+    # ---------- 快照 ----------
+    def snapshot(self, hand=()):
+        """
+        整个牌库压成一个整数数组：[抽牌堆张数, 弃牌堆张数, 抽牌堆..., 弃牌堆..., 手牌...]
+        （变体编号也原样保存，恢复时需要同一张卡表和变体）
+        """
+        draw = self._cards[self._pos:]
+        out = array(ID_TYPECODE, (len(draw), len(self.discard)))
+        out.extend(draw)
+        out.extend(self.discard)
+        out.extend(hand)
+        return out
+
+    @classmethod
+    def restore(cls, table, snapshot, rng=None):
+        """由 snapshot() 的数组恢复，返回 (Deck, 手牌编号列表)"""
+        snapshot = array(ID_TYPECODE, snapshot)
+        n_draw, n_discard = snapshot[0], snapshot[1]
+        deck = cls(snapshot[2:2 + n_draw], rng, table=table)
+        deck.discard.extend(snapshot[2 + n_draw:2 + n_draw + n_discard])
+        return deck, list(snapshot[2 + n_draw + n_discard:])
+
+    def __repr__(self):
+        return f"Deck(抽牌堆={len(self)}, 弃牌堆={len(self.discard)}, 卡表={len(self.table)}种, 洗牌{self.reshuffles}次)"
@@ -0,0 +1,224 @@
+import functools
+import re
+
+from core import rng as rngs
+
+try:  # 可选依赖：有 NumPy 时大批量判定走向量化
+    import numpy as np
+except ImportError:
+    np = None
+
+# ===================== 骰子表达式（编译一次，反复掷骰） =====================
+# 支持的写法（不区分大小写，空格忽略）：
+#   3 / -1          常数（可为负）
+#   d6 / D6 / 2d6   N 个 S 面骰之和（N 省略为 1）
+#   4d6kh3 / 4d6k3  掷 4 个 6 面骰取最高 3 个
+#   2+d3 / d6-1     以上各项用 + / - 连接
+# 表达式编译成 DiceExpr（可调用对象），按原文缓存；未指定 rng 时使用 core.rng 的
+# 玩家掷骰流（长期存在，不再每次重置种子）。
+
+MAX_DICE = 1000   # 单项最多骰子数，防止表格里写错导致卡死
+NUMPY_MIN_BATCH = 64   # 批量判定达到这个数量才交给 NumPy（小批量纯 Python 更快）
+
+_TERM = re.compile(r"([+-]?)(?:(\d*)d(\d+)(?:kh?(\d+))?|(\d+))")
+
+RNG = rngs.stream(rngs.PLAYER_DICE)
+
+
+class DiceSyntaxError(ValueError):
+    """骰子表达式无法解析"""
+
+
+def set_rng(rng):
+    """替换全局掷骰用的随机数生成器（需提供 random()），返回旧的"""
+    global RNG
+    old, RNG = RNG, rng
+    return old
+
+
+# ===================== 解析 =====================
+def parse(expr):
+    """
+    把表达式解析为项列表：
+    - 常数项：(符号, 0, 0, 0, 常数)
+    - 骰子项：(符号, 骰子数, 面数, 取最高几个(0=全取), 0)
+    符号为 1 或 -1
+    """
+    text = str(expr).strip().lower().replace(" ", "")
+    if not text:
+        raise DiceSyntaxError(f"空的骰子表达式：{expr!r}")
+    terms = []
+    pos = 0
+    while pos < len(text):
+        m = _TERM.match(text, pos)
+        if m is None or m.end() == pos:
+            raise DiceSyntaxError(f"无法解析骰子表达式：{expr!r}")
+        sign_str, count, sides, keep, const = m.groups()
+        if pos and not sign_str:
+            raise DiceSyntaxError(f"骰子表达式缺少 +/-：{expr!r}")
+        sign = -1 if sign_str == "-" else 1
+        if const is not None:
+            terms.append((sign, 0, 0, 0, int(const)))
+        else:
+            count = int(count) if count else 1
+            sides = int(sides)
+            keep = int(keep) if keep else 0
+            if not 1 <= count <= MAX_DICE or sides < 1 or keep > count:
+                raise DiceSyntaxError(f"骰子数量/面数不合法：{expr!r}")
+            terms.append((sign, count, sides, keep, 0))
+        pos = m.end()
+    return tuple(terms)
+
+
+# ===================== 编译 =====================
+def _compile_term(count, sides, keep):
+    """单个骰子项 -> f(rng)"""
+    if keep and keep < count:
+        def roll_keep(rng):
+            rolls = sorted((int(rng.random() * sides) + 1 for _ in range(count)), reverse=True)
+            return sum(rolls[:keep])
+        return roll_keep
+    if count == 1:
+        return lambda rng: int(rng.random() * sides) + 1
+    def roll_sum(rng):
+        rand = rng.random
+        return sum(int(rand() * sides) for _ in range(count)) + count
+    return roll_sum
+
+
+class DiceExpr:
+    """编译后的骰子表达式：expr() 掷一次；min/max 为取值范围"""
+    __slots__ = ("expr", "terms", "constant", "min", "max", "_parts")
+
+    def __init__(self, expr, terms):
+        self.expr = expr
+        self.terms = terms
+        self.constant = sum(sign * const for sign, count, _, _, const in terms if not count)
+        self._parts = tuple((sign, _compile_term(count, sides, keep))
+                            for sign, count, sides, keep, _ in terms if count)
+        lo = hi = self.constant
+        for sign, count, sides, keep, _ in terms:
+            if count:
+                n = keep or count
+                lo, hi = (lo + n, hi + n * sides) if sign > 0 else (lo - n * sides, hi - n)
+        self.min, self.max = lo, hi
+
+    @property
+    def is_constant(self):
+        return not self._parts
+
+    def __call__(self, rng=None):
+        if not self._parts:
+            return self.constant
+        rng = RNG if rng is None else rng
+        total = self.constant
+        for sign, part in self._parts:
+            total += sign * part(rng)
+        return total
+
+    def __repr__(self):
+        return f"DiceExpr({self.expr!r})"
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(text):
+    return DiceExpr(text, parse(text))
+
+def compile_dice(expr):
+    """编译（带缓存）；无法解析时抛 DiceSyntaxError"""
+    return _compile(str(expr).strip())
+
+ZERO = compile_dice("0")
+
+def dice_or_zero(expr):
+    """表格数据用的宽松版本：空值/无法解析时按 0 处理"""
+    if expr is None or str(expr).strip() == "":
+        return ZERO
+    try:
+        return compile_dice(expr)
+    except DiceSyntaxError:
+        return ZERO
+
+def roll(expr, rng=None):
+    """直接按表达式原文掷一次（表达式会被缓存）"""
+    return dice_or_zero(expr)(rng)
+
+
+# ===================== 批量判定（攻击/格挡/闪避） =====================
+# 一次结算 N 个「掷 d6 ≥ 阈值」判定，返回命中数；需要逐骰日志时再附带紧凑的
+# 点数记录（bytes，每骰 1 字节），日志文本在真正显示时才格式化。
+# 不论是否记录点数，掷骰方式都一样，随机数消耗一致，结果不受日志开关影响：
+# - 小批量：逐颗 int(random()*面数)+1
+# - 大批量（≥ NUMPY_MIN_BATCH 且装了 NumPy）：从该流取 64 位种子建 NumPy Generator，一次掷出整批
+# 同一种子下，只有大批量判定的结果会因是否装了 NumPy 而不同（游戏内每批只有几颗骰子）。
+
+def _numpy_generator(rng):
+    """由 Python RNG 派生一个 NumPy Generator（种子取自该 RNG，重设种子后仍可复现）"""
+    return np.random.default_rng(rng.getrandbits(64))
+
+
+class CheckResult:
+    """一批判定的结果：hits 命中数；rolls 为逐骰点数（bytes，未记录时为 None）"""
+    __slots__ = ("count", "threshold", "hits", "rolls")
+
+    def __init__(self, count, threshold, hits, rolls=None):
+        self.count = count
+        self.threshold = threshold
+        self.hits = hits
+        self.rolls = rolls
+
+    @property
+    def misses(self):
+        return self.count - self.hits
+
+    def describe(self, label, check, ok="成功", fail="失败"):
+        """返回惰性日志对象：str() 时才拼接文本"""
+        return CheckLog(self, label, check, ok, fail)
+
+    def __repr__(self):
+        return f"CheckResult(count={self.count}, threshold={self.threshold}, hits={self.hits})"
+
+
+class CheckLog:
+    """判定日志（惰性格式化）：掷骰点数 | 判定条件 → 成功 x/n"""
+    __slots__ = ("result", "label", "check", "ok", "fail")
+
+    def __init__(self, result, label, check, ok, fail):
+        self.result = result
+        self.label = label
+        self.check = check
+        self.ok = ok
+        self.fail = fail
+
+    def __str__(self):
+        r = self.result
+        if r.rolls is None:
+            detail = f"{r.count}次"
+        else:
+            detail = "掷骰：" + " ".join(map(str, r.rolls))
+        return f"{self.label}{detail} | {self.check} → {self.ok}{r.hits}次 / {self.fail}{r.misses}次"
+
+
+def roll_checks(count, threshold, sides=6, rng=None, keep_rolls=False):
+    """
+    掷 count 个 sides 面骰，统计点数 ≥ threshold 的个数
+    keep_rolls 只决定是否保留点数，掷骰方式不变：同一个种子下，开不开日志/事件记录，
+    命中数和随机数流都完全一样（战斗可以无界面重放）
+    """
+    count = max(0, int(count))
+    rng = RNG if rng is None else rng
+    if np is not None and count >= NUMPY_MIN_BATCH and hasattr(rng, "getrandbits"):
+        arr = _numpy_generator(rng).integers(1, sides + 1, count,
+                                             dtype=np.uint8 if sides <= 255 else np.int64)
+        hits = int(np.count_nonzero(arr >= threshold))
+        if not keep_rolls:
+            return CheckResult(count, threshold, hits)
+        return CheckResult(count, threshold, hits,
+                           arr.tobytes() if sides <= 255 else tuple(arr.tolist()))
+    rand = rng.random
+    if not keep_rolls:
+        hits = sum(int(rand() * sides) + 1 >= threshold for _ in range(count))
+        return CheckResult(count, threshold, hits)
+    rolls = [int(rand() * sides) + 1 for _ in range(count)]
+    hits = sum(1 for r in rolls if r >= threshold)
+    return CheckResult(count, threshold, hits, bytes(rolls) if sides <= 255 else tuple(rolls))
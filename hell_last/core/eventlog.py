@@ -0,0 +1,153 @@
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+
+from core import catalog
+
+# ===================== 结构化战斗事件流（JSON Lines） =====================
+# 每条事件一行 JSON：{"t": 时间戳, "battle": 战斗ID, "round": 回合, "type": 事件类型, ...字段}
+# 事件类型：start / phase / card / weapon_dice / dice / damage / end（由 core.battle 引擎发出），
+#           hp_sync（战斗结束后同步玩家血量，由 battle_core 发出）
+# emit() 只把事件放进队列，后台线程负责序列化和写盘，界面线程不会卡在磁盘 IO 上。
+# 文件超过 max_bytes 时轮转：events.jsonl -> events.1.jsonl(.gz) -> events.2 ...，
+# 最多保留 backups 个旧文件；compress=True 时旧文件用 gzip 压缩。
+# 默认开启，文件写在 .card_cache/battle_events/ 下；设置环境变量 HELL_LAST_EVENT_LOG=0 关闭。
+
+EVENT_DIRNAME = "battle_events"
+EVENT_FILE = "events.jsonl"
+EVENT_LOG_ENV = "HELL_LAST_EVENT_LOG"
+
+_STOP = object()
+
+
+def enabled_from_env():
+    """事件流默认开启；环境变量 HELL_LAST_EVENT_LOG 为 0/false/no/off 时关闭"""
+    return os.environ.get(EVENT_LOG_ENV, "").strip().lower() not in ("0", "false", "no", "off")
+
+def new_battle_id():
+    return uuid.uuid4().hex[:12]
+
+
+class EventWriter:
+    def __init__(self, directory=None, filename=EVENT_FILE, max_bytes=8 * 1024 * 1024,
+                 backups=5, compress=True, flush_interval=1.0):
+        self.directory = directory or os.path.join(catalog.get_cache_dir(), EVENT_DIRNAME)
+        self.path = os.path.join(self.directory, filename)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.dropped = 0          # 写盘失败丢弃的事件数
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ---------- 界面线程调用 ----------
+    def emit(self, kind, battle_id, round_no=0, fields=None):
+        """放入队列立即返回（序列化在后台线程做）"""
+        self._ensure_started()
+        self._queue.put((time.time(), battle_id, round_no, kind, fields))
+
+    def callback(self, battle_id):
+        """生成给 BattleEngine(on_event=...) 用的回调"""
+        def on_event(kind, round_no, fields):
+            self.emit(kind, battle_id, round_no, fields)
+        return on_event
+
+    def close(self, timeout=5.0):
+        """写完队列里剩余的事件后停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="battle-event-writer", daemon=True)
+                self._thread.start()
+
+    # ---------- 后台线程 ----------
+    def _run(self):
+        f = None
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            try:
+                if item is not None:
+                    if f is None:
+                        f = self._open()
+                    f.write(self._encode(item))
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        f = None
+                        self._rotate()
+                if f is not None and time.monotonic() - last_flush >= self.flush_interval:
+                    f.flush()
+                    last_flush = time.monotonic()
+            except (OSError, TypeError, ValueError) as e:
+                self.dropped += 1
+                print(f"⚠️ 战斗事件写入失败：{e}")
+                if f is not None:
+                    f.close()
+                    f = None
+        if f is not None:
+            f.close()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _encode(item):
+        t, battle_id, round_no, kind, fields = item
+        record = {"t": round(t, 3), "battle": battle_id, "round": round_no, "type": kind}
+        if fields:
+            record.update(fields)
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def _backup_path(self, i):
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{i}{ext}" + (".gz" if self.compress else "")
+
+    def _rotate(self):
+        oldest = self._backup_path(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.backups - 1, 0, -1):
+            src = self._backup_path(i)
+            if os.path.exists(src):
+                os.replace(src, self._backup_path(i + 1))
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        target = self._backup_path(1)
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, target)
+
+
+def read_events(path):
+    """逐条读取事件文件（.jsonl 或 .jsonl.gz），分析用"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -0,0 +1,76 @@
+# ===================== 增量列表视图（差量更新 Listbox） =====================
+# 手牌、已购卡牌这类列表每次操作只变动一两行：出一张牌少一行、买一张牌改一行。
+# ListView 记住控件里当前每一行对应的 key（如卡牌编号），update(新 key 列表) 时
+# 先跳过首尾相同的部分，只对中间变化的一段做 delete/insert；
+# 每个 key 的显示文本按 key 缓存，只有新出现的 key 才调用 render 生成文本。
+# 行文本带序号时 key 里也带上序号（如 (序号, 编号)）：出一张牌时它前面的行不动，
+# 只改写它之后序号变化的行；购买已有卡牌只替换 1 行，买新卡只在末尾插入 1 行。
+# 不依赖 tkinter：listbox 只要有 insert(index, *lines) / delete(first, last) 即可。
+
+class ListView:
+    def __init__(self, listbox, render, empty_text=None, cache_size=256):
+        """
+        render：key -> 显示文本（key 的内容变化时应换一个 key，例如 (编号, 数量)）
+        empty_text：列表为空时显示的占位行（None 表示留空）
+        """
+        self.listbox = listbox
+        self.render = render
+        self.empty_text = empty_text
+        self.cache_size = cache_size
+        self.keys = []          # 控件中当前各行对应的 key（不含占位行）
+        self._lines = {}        # key -> 已生成的显示文本
+        self._placeholder = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def line(self, key):
+        text = self._lines.get(key)
+        if text is None:
+            if len(self._lines) >= self.cache_size + len(self.keys):
+                self._lines = {k: self._lines[k] for k in self.keys if k in self._lines}
+            text = self._lines[key] = self.render(key)
+        return text
+
+    def update(self, keys):
+        """让控件显示 keys 对应的行，返回改动（删除 + 插入）的行数"""
+        keys = list(keys)
+        old = self.keys
+        lb = self.listbox
+        changed = 0
+        if self._placeholder and keys:
+            lb.delete(0)
+            self._placeholder = False
+            changed += 1
+
+        # 首尾相同的部分不动
+        n_old, n_new = len(old), len(keys)
+        start = 0
+        limit = min(n_old, n_new)
+        while start < limit and old[start] == keys[start]:
+            start += 1
+        end_old, end_new = n_old, n_new
+        while end_old > start and end_new > start and old[end_old - 1] == keys[end_new - 1]:
+            end_old -= 1
+            end_new -= 1
+
+        if end_old > start:
+            lb.delete(start, end_old - 1)
+            changed += end_old - start
+        if end_new > start:
+            lb.insert(start, *(self.line(k) for k in keys[start:end_new]))
+            changed += end_new - start
+        self.keys = keys
+
+        if not keys and not self._placeholder and self.empty_text is not None:
+            lb.insert(0, self.empty_text)
+            self._placeholder = True
+            changed += 1
+        return changed
+
+    def invalidate(self, key=None):
+        """丢弃缓存的显示文本（key=None 表示全部）；控件中已有的行要等下次 update 改到才会更新"""
+        if key is None:
+            self._lines.clear()
+        else:
+            self._lines.pop(key, None)
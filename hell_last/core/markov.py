@@ -0,0 +1,129 @@
+import functools
+
+from core import probability as prob
+
+# ===================== 战斗结果精确求解（马尔可夫链） =====================
+# 把一场战斗看成状态 (玩家生命, NPC总生命) 上的吸收马尔可夫链，每回合：
+#   1. 玩家攻击：attacks 次（+装备额外攻击骰）→ 命中 → NPC格挡，净命中 × 单次伤害
+#   2. NPC 总生命 ≤ 0 → 胜利
+#   3. NPC 反击：d6 次攻击 → 命中；玩家格挡 defenses 次（+装备额外防御骰）→ 每次未挡住扣 NPC 伤害
+#   4. 玩家生命 ≤ 0 → 失败，否则进入下一回合
+# 每回合的伤害分布与当前生命无关，生命只减不增，所以按生命从小到大递推即可，
+# 双方都没掉血的回合（自环）用 1/(1-p) 消掉。没有回合上限：双方都打不动时按不胜处理。
+# 卡牌的随机性没有建模：默认每回合打出一张 +1 次的攻击卡、反应阶段不出牌。
+
+class Forecast:
+    """求解结果：win 胜率；expected_hp_loss 预计损失生命；expected_rounds 预计回合数"""
+    __slots__ = ("win", "expected_hp_loss", "expected_rounds")
+
+    def __init__(self, win, expected_hp_loss, expected_rounds):
+        self.win = win
+        self.expected_hp_loss = expected_hp_loss
+        self.expected_rounds = expected_rounds
+
+    @property
+    def lose(self):
+        return 1.0 - self.win
+
+    def __str__(self):
+        return f"胜率 {self.win:.0%}，预计 −{self.expected_hp_loss:.0f} HP"
+
+    def __repr__(self):
+        return (f"Forecast(win={self.win:.4f}, expected_hp_loss={self.expected_hp_loss:.2f}, "
+                f"expected_rounds={self.expected_rounds:.2f})")
+
+
+# ===================== 单回合伤害分布 =====================
+def player_damage_pmf(attacks, extra_attack, hit_threshold, base_damage, npc_block_threshold):
+    """玩家一回合对 NPC 造成的伤害分布"""
+    return prob.net_damage_pmf(attacks, hit_threshold, npc_block_threshold, base_damage, extra_attack)
+
+def npc_damage_pmf(npc_hit_threshold, npc_damage, defenses=0, extra_defense=None):
+    """NPC 一次反击（d6 次攻击）对玩家造成的伤害分布"""
+    hits = prob.net_hits_pmf(0, npc_hit_threshold, 7, "d6")
+    blocks = prob.point(max(0, int(defenses)))
+    if extra_defense:
+        blocks = prob.convolve(blocks, prob.dice_pmf(extra_defense)).clamp_min(0)
+    through = prob.convolve(hits, prob.negate(blocks)).clamp_min(0)
+    npc_damage = max(0, int(npc_damage))
+    out = [0.0] * (through.hi * npc_damage + 1)
+    for k, p in through.items():
+        out[k * npc_damage] += p
+    return prob.Pmf(0, out)
+
+
+# ===================== 递推求解 =====================
+@functools.lru_cache(maxsize=64)
+def _solve_grid(dealt, taken, max_hp, max_npc_hp):
+    """
+    dealt/taken：玩家每回合造成/受到的伤害分布（Pmf.items() 元组，便于缓存）
+    返回三张表 W/F/R[h][n]：胜率、结束时剩余生命期望、回合数期望（h/n 从 1 开始）
+    """
+    p_dealt0 = dict(dealt).get(0, 0.0)
+    p_taken0 = dict(taken).get(0, 0.0)
+    stay = p_dealt0 * p_taken0
+    moves = [(d, e, pd * pe) for d, pd in dealt for e, pe in taken if (d or e)]
+
+    win = [[0.0] * (max_npc_hp + 1) for _ in range(max_hp + 1)]
+    left = [[0.0] * (max_npc_hp + 1) for _ in range(max_hp + 1)]
+    rounds = [[0.0] * (max_npc_hp + 1) for _ in range(max_hp + 1)]
+    for h in range(1, max_hp + 1):
+        for n in range(1, max_npc_hp + 1):
+            if stay >= 1.0:
+                win[h][n], left[h][n], rounds[h][n] = 0.0, float(h), float("inf")
+                continue
+            w = f = r = 0.0
+            # 本回合打死 NPC：不会再被反击
+            for d, pd in dealt:
+                if d >= n:
+                    w += pd
+                    f += pd * h
+            for d, e, p in moves:
+                if d >= n or e >= h:
+                    continue  # 胜利已计入；失败时胜率和剩余生命都是 0
+                w += p * win[h - e][n - d]
+                f += p * left[h - e][n - d]
+                r += p * rounds[h - e][n - d]
+            scale = 1.0 / (1.0 - stay)
+            win[h][n] = w * scale
+            left[h][n] = f * scale
+            rounds[h][n] = (1.0 + r) * scale
+    return win, left, rounds
+
+def solve(player_hp, npc_hp, dealt, taken):
+    """按单回合伤害分布求解；npc_hp 可为 Pmf（敌人数量是骰子表达式时）"""
+    if player_hp <= 0:
+        return Forecast(0.0, 0.0, 0.0)
+    npc_hps = npc_hp.items() if isinstance(npc_hp, prob.Pmf) else [(npc_hp, 1.0)]
+    max_npc_hp = max(1, max(n for n, _ in npc_hps))
+    win, left, rounds = _solve_grid(tuple(dealt.items()), tuple(taken.items()), player_hp, max_npc_hp)
+    w = f = r = 0.0
+    for n, p in npc_hps:
+        if n <= 0:
+            w += p
+            f += p * player_hp
+            continue
+        w += p * win[player_hp][n]
+        f += p * left[player_hp][n]
+        r += p * rounds[player_hp][n]
+    return Forecast(w, player_hp - f, r)
+
+@functools.lru_cache(maxsize=1024)
+def forecast(player_hp, hit_threshold, base_damage, extra_attack, extra_defense,
+             npc_hp, npc_count, npc_hit_threshold, npc_block_threshold, npc_damage,
+             attacks=1, defenses=0):
+    """
+    按参数求解一场战斗（结果按参数元组缓存）
+    npc_hp 为单个敌人生命；npc_count 为数量（整数或骰子表达式，如 "2+d3"）
+    """
+    dealt = player_damage_pmf(attacks, extra_attack, hit_threshold, base_damage, npc_block_threshold)
+    taken = npc_damage_pmf(npc_hit_threshold, npc_damage, defenses, extra_defense)
+    counts = prob.dice_pmf(npc_count).clamp_min(0)
+    if len(counts.probs) == 1:
+        total = npc_hp * counts.lo
+    else:
+        out = [0.0] * (counts.hi * npc_hp + 1)
+        for c, p in counts.items():
+            out[c * npc_hp] += p
+        total = prob.Pmf(0, out)
+    return solve(player_hp, total, dealt, taken)
@@ -0,0 +1,182 @@
+import functools
+import math
+
+from core import dice
+from core.util import parse_check_condition
+
+# ===================== 精确概率（不抽样） =====================
+# 分布统一表示为 Pmf(lo, probs)：取值 lo, lo+1, ... 的概率依次为 probs[0], probs[1], ...
+# - check_pmf(n, threshold)：n 个 d6 判定中成功次数的二项分布
+# - dice_pmf(expr)：骰子表达式（2d6 / D6 / 2+d3 / 4d6kh3 / -1）的分布，逐项卷积
+# - net_hits_pmf / net_damage_pmf：攻击次数 → 命中 → 对方格挡后的净命中/伤害
+# 结果都按参数缓存，重复查询不再计算。
+
+class Pmf:
+    """整数取值的概率分布（不可变）"""
+    __slots__ = ("lo", "probs")
+
+    def __init__(self, lo, probs):
+        self.lo = lo
+        self.probs = tuple(probs)
+
+    @property
+    def hi(self):
+        return self.lo + len(self.probs) - 1
+
+    def items(self):
+        return [(self.lo + i, p) for i, p in enumerate(self.probs) if p]
+
+    def prob(self, value):
+        i = value - self.lo
+        return self.probs[i] if 0 <= i < len(self.probs) else 0.0
+
+    def mean(self):
+        return sum((self.lo + i) * p for i, p in enumerate(self.probs))
+
+    def variance(self):
+        m = self.mean()
+        return sum((self.lo + i - m) ** 2 * p for i, p in enumerate(self.probs))
+
+    def at_least(self, value):
+        """P(X >= value)"""
+        start = max(0, value - self.lo)
+        return sum(self.probs[start:])
+
+    def clamp_min(self, floor):
+        """max(X, floor) 的分布（如攻击次数减到负数按 0 算）"""
+        if self.lo >= floor:
+            return self
+        cut = floor - self.lo
+        if cut >= len(self.probs):
+            return Pmf(floor, (1.0,))
+        return Pmf(floor, (sum(self.probs[:cut + 1]),) + self.probs[cut + 1:])
+
+    def __repr__(self):
+        return f"Pmf({self.lo}, {list(self.probs)})"
+
+
+def point(value):
+    return Pmf(value, (1.0,))
+
+def convolve(a, b):
+    """两个独立分布之和"""
+    out = [0.0] * (len(a.probs) + len(b.probs) - 1)
+    for i, p in enumerate(a.probs):
+        if p:
+            for j, q in enumerate(b.probs):
+                out[i + j] += p * q
+    return Pmf(a.lo + b.lo, out)
+
+def negate(a):
+    return Pmf(-a.hi, reversed(a.probs))
+
+def mixture(weighted):
+    """[(权重, Pmf)] 的混合分布"""
+    lo = min(pmf.lo for _, pmf in weighted)
+    hi = max(pmf.hi for _, pmf in weighted)
+    out = [0.0] * (hi - lo + 1)
+    for w, pmf in weighted:
+        for i, p in enumerate(pmf.probs):
+            out[pmf.lo - lo + i] += w * p
+    return Pmf(lo, out)
+
+
+# ===================== 判定（二项分布） =====================
+def success_probability(threshold, sides=6):
+    """单个 d{sides} 掷出 ≥ threshold 的概率；threshold 可为 "3+" 这样的字符串"""
+    if isinstance(threshold, str):
+        threshold = parse_check_condition(threshold)
+    return min(1.0, max(0.0, (sides - threshold + 1) / sides))
+
+@functools.lru_cache(maxsize=4096)
+def _binomial(n, p):
+    q = 1.0 - p
+    return Pmf(0, [math.comb(n, k) * p ** k * q ** (n - k) for k in range(n + 1)])
+
+def check_pmf(n, threshold, sides=6):
+    """n 个判定（阈值 threshold）的成功次数分布，按 (n, 阈值) 缓存"""
+    return _binomial(max(0, int(n)), success_probability(threshold, sides))
+
+
+# ===================== 骰子表达式 =====================
+def _sum_pmf(count, sides):
+    pmf = point(0)
+    face = Pmf(1, [1.0 / sides] * sides)
+    for _ in range(count):
+        pmf = convolve(pmf, face)
+    return pmf
+
+def _keep_highest_pmf(count, sides, keep):
+    """count 个 sides 面骰取最高 keep 个之和：按各点数出现次数枚举（多项式系数加权）"""
+    out = {}
+    total = sides ** count
+
+    def walk(face, remaining, weight, kept, kept_sum):
+        if face == 0:
+            if remaining == 0:
+                out[kept_sum] = out.get(kept_sum, 0) + weight
+            return
+        for k in range(remaining + 1):
+            take = min(k, keep - kept)
+            walk(face - 1, remaining - k, weight * math.comb(remaining, k), kept + take, kept_sum + take * face)
+
+    walk(sides, count, 1, 0, 0)
+    lo, hi = min(out), max(out)
+    return Pmf(lo, [out.get(v, 0) / total for v in range(lo, hi + 1)])
+
+@functools.lru_cache(maxsize=1024)
+def _expr_pmf(text):
+    pmf = point(0)
+    for sign, count, sides, keep, const in dice.parse(text):
+        if not count:
+            term = point(const)
+        elif keep and keep < count:
+            term = _keep_highest_pmf(count, sides, keep)
+        else:
+            term = _sum_pmf(count, sides)
+        pmf = convolve(pmf, term if sign > 0 else negate(term))
+    return pmf
+
+def dice_pmf(expr):
+    """骰子表达式的精确分布；空值/无法解析按 0"""
+    return _expr_pmf(dice.dice_or_zero(expr).expr)
+
+
+# ===================== 攻击结算 =====================
+@functools.lru_cache(maxsize=4096)
+def _net_hits(n, hit_threshold, block_threshold):
+    # 每次攻击独立：先命中、再未被格挡，等价于成功率 p_hit × (1 - p_block) 的二项分布
+    p = success_probability(hit_threshold) * (1.0 - success_probability(block_threshold))
+    return _binomial(n, p)
+
+def net_hits_pmf(attacks, hit_threshold, block_threshold, extra=None):
+    """
+    攻击 attacks 次（可再加骰子表达式 extra，如 D6/-1，总次数最少为 0），
+    对方按 block_threshold 格挡后的净命中次数分布
+    """
+    hit_threshold = parse_check_condition(hit_threshold) if isinstance(hit_threshold, str) else hit_threshold
+    block_threshold = parse_check_condition(block_threshold) if isinstance(block_threshold, str) else block_threshold
+    times = convolve(point(max(0, int(attacks))), dice_pmf(extra)).clamp_min(0) if extra else point(max(0, int(attacks)))
+    if len(times.probs) == 1:
+        return _net_hits(times.lo, hit_threshold, block_threshold)
+    return mixture([(w, _net_hits(n, hit_threshold, block_threshold)) for n, w in times.items()])
+
+def net_damage_pmf(attacks, hit_threshold, block_threshold, damage_per_hit, extra=None):
+    """净伤害分布 = 净命中次数 × 单次伤害"""
+    hits = net_hits_pmf(attacks, hit_threshold, block_threshold, extra)
+    if damage_per_hit == 1:
+        return hits
+    damage_per_hit = max(0, int(damage_per_hit))
+    if damage_per_hit == 0:
+        return point(0)
+    out = [0.0] * (hits.hi * damage_per_hit + 1)
+    for k, p in hits.items():
+        out[k * damage_per_hit] += p
+    return Pmf(0, out)
+
+def expected_hits(attacks, hit_threshold, extra=None):
+    """命中次数期望（不考虑对方格挡）"""
+    return net_hits_pmf(attacks, hit_threshold, 7, extra).mean()
+
+def expected_damage(attacks, hit_threshold, block_threshold, damage_per_hit, extra=None):
+    return net_hits_pmf(attacks, hit_threshold, block_threshold, extra).mean() * damage_per_hit
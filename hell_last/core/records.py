@@ -0,0 +1,199 @@
+from core.dice import dice_or_zero
+from core.util import safe_int, safe_str, parse_check_condition
+
+# ===================== 卡牌/敌人/武器记录类型 =====================
+# 用 __slots__ 代替每张卡一个中文键字典：
+# - 数值字段在加载时解析一次（能量消耗/伤害值/HP/判定阈值 ...），出牌时直接读属性
+# - 卡牌本身不可变，牌库/手牌里放同一个对象的引用，不再 card.copy()
+# - 保留字典兼容接口（card["卡名"] / card.get(...) / card.copy()），界面代码无需改动
+
+class Record:
+    """slots 记录的基类：KEYS 为「字典键 -> 属性名」"""
+    __slots__ = ()
+    KEYS = {}
+
+    def __getitem__(self, key):
+        try:
+            attr = self.KEYS[key]
+        except KeyError:
+            raise KeyError(key) from None
+        return getattr(self, attr)
+
+    def __setitem__(self, key, value):
+        try:
+            attr = self.KEYS[key]
+        except KeyError:
+            raise KeyError(key) from None
+        setattr(self, attr, value)
+
+    def get(self, key, default=None):
+        attr = self.KEYS.get(key)
+        if attr is None:
+            return default
+        return getattr(self, attr)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def keys(self):
+        return self.KEYS.keys()
+
+    def values(self):
+        return [getattr(self, attr) for attr in self.KEYS.values()]
+
+    def items(self):
+        return [(key, getattr(self, attr)) for key, attr in self.KEYS.items()]
+
+    def copy(self):
+        """复制成普通字典（商店购买等需要附加字段的场景）"""
+        return {key: getattr(self, attr) for key, attr in self.KEYS.items()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.copy()!r})"
+
+
+# ===================== 行动卡 =====================
+# 卡牌类型 -> (加成说明, 取哪个数值作为次数加成)
+CARD_BONUS = {
+    "伤害": ("攻击次数", "damage"),
+    "防御": ("格挡次数", "defense"),
+    "移动": ("闪避次数", "move"),
+    "能量": ("倍数", "energy_gain"),
+}
+
+class ActionCard(Record):
+    __slots__ = ("id", "name", "card_type", "cost", "move", "damage", "defense",
+                 "energy_gain", "count", "desc", "price", "bonus_label", "bonus")
+    KEYS = {
+        "编号": "id", "卡名": "name", "卡牌类型": "card_type", "能量消耗": "cost",
+        "移动值": "move", "伤害值": "damage", "防御值": "defense", "能量增益": "energy_gain",
+        "持有数量": "count", "描述": "desc", "价格": "price",
+    }
+
+    def __init__(self, id, name, card_type, cost=0, move=0, damage=0, defense=0,
+                 energy_gain=0, count=1, desc="", price=0):
+        self.id = id
+        self.name = name
+        self.card_type = card_type
+        self.cost = cost
+        self.move = move
+        self.damage = damage
+        self.defense = defense
+        self.energy_gain = energy_gain
+        self.count = count
+        self.desc = desc
+        self.price = price
+        # 按卡牌类型预先算好次数加成，出牌/刷新手牌时不再判断类型
+        label, attr = CARD_BONUS.get(card_type, ("", None))
+        self.bonus_label = label
+        self.bonus = getattr(self, attr) if attr else 0
+
+    @classmethod
+    def from_mapping(cls, m):
+        """从字典/CardRow 构造（已是 ActionCard 则原样返回）"""
+        if isinstance(m, cls):
+            return m
+        return cls(
+            safe_int(m.get("编号")), safe_str(m.get("卡名")), safe_str(m.get("卡牌类型")),
+            safe_int(m.get("能量消耗", 0)), safe_int(m.get("移动值", 0)), safe_int(m.get("伤害值", 0)),
+            safe_int(m.get("防御值", 0)), safe_int(m.get("能量增益", 0)), safe_int(m.get("持有数量", 1), 1),
+            safe_str(m.get("描述", "")), safe_int(m.get("价格", 0)),
+        )
+
+
+# ===================== 探索卡 =====================
+class MapCard(Record):
+    __slots__ = ("name", "description", "effect", "event")
+    KEYS = {"name": "name", "description": "description", "effect": "effect", "event": "event"}
+
+    def __init__(self, name, description, effect, event=None):
+        self.name = name
+        self.description = description
+        self.effect = effect
+        self.event = event  # 存储该节点触发的事件
+
+class PassageCard(Record):
+    __slots__ = ("name", "description", "effect")
+    KEYS = {"name": "name", "description": "description", "effect": "effect"}
+
+    def __init__(self, name, description, effect):
+        self.name = name
+        self.description = description
+        self.effect = effect
+
+class EventCard(Record):
+    __slots__ = ("name", "description", "type", "effect", "keywords", "role", "quantity", "completed",
+                 "quantity_dice")
+    KEYS = {
+        "name": "name", "description": "description", "type": "type", "effect": "effect",
+        "关键词": "keywords", "角色": "role", "数量": "quantity", "completed": "completed",
+    }
+
+    def __init__(self, name, description, type, effect, keywords, role="", quantity="", completed=False):
+        self.name = name
+        self.description = description
+        self.type = type
+        self.effect = effect
+        self.keywords = keywords  # 战斗触发关键词
+        self.role = role
+        self.quantity = quantity
+        self.completed = completed
+        self.quantity_dice = dice_or_zero(quantity)  # 敌人数量可写成 2+d3
+
+    @property
+    def is_battle(self):
+        return "战斗" in self.keywords or "怪物" in self.keywords or "敌人" in self.keywords
+
+
+# ===================== 敌人 =====================
+class Enemy(Record):
+    __slots__ = ("name", "number", "hp", "damage", "hit_check", "block_check",
+                 "base_attack_times", "hit_threshold", "block_threshold")
+    KEYS = {
+        "name": "name", "number": "number", "hp": "hp", "damage": "damage",
+        "hit_check": "hit_check", "block_check": "block_check", "base_attack_times": "base_attack_times",
+    }
+
+    def __init__(self, name, number=1, hp=5, damage=1, hit_check="3+", block_check="3+", base_attack_times=1):
+        self.name = name
+        self.number = number
+        self.hp = hp
+        self.damage = damage
+        self.hit_check = hit_check
+        self.block_check = block_check
+        self.base_attack_times = base_attack_times
+        self.hit_threshold = parse_check_condition(hit_check)
+        self.block_threshold = parse_check_condition(block_check)
+
+
+# ===================== 武器 =====================
+class Weapon(Record):
+    __slots__ = ("id", "name", "extra_attack", "hit", "damage", "extra_defense", "block",
+                 "desc", "trait", "hit_threshold", "block_threshold",
+                 "extra_attack_dice", "extra_defense_dice")
+    KEYS = {
+        "编号": "id", "武器名": "name", "额外攻击次数": "extra_attack", "命中": "hit",
+        "伤害": "damage", "额外防御次数": "extra_defense", "格挡": "block",
+        "描述": "desc", "特性": "trait",
+    }
+
+    def __init__(self, id, name, extra_attack, hit, damage, extra_defense, block, desc="", trait=""):
+        self.id = id
+        self.name = name
+        self.extra_attack = extra_attack    # 骰子表达式原文（如 D6 / -1），战斗中实时掷骰
+        self.hit = hit
+        self.damage = damage
+        self.extra_defense = extra_defense
+        self.block = block
+        self.desc = desc
+        self.trait = trait
+        self.hit_threshold = parse_check_condition(hit)
+        self.block_threshold = parse_check_condition(block)
+        self.extra_attack_dice = dice_or_zero(extra_attack)
+        self.extra_defense_dice = dice_or_zero(extra_defense)
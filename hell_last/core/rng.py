@@ -0,0 +1,82 @@
+import hashlib
+import os
+import random
+import secrets
+
+# ===================== 随机数服务（每局一个种子，按子系统分流） =====================
+# 每个子系统用自己的 random.Random（由「局种子 + 流名」哈希派生），互不干扰：
+# 多抽一张地图卡不会改变后面的战斗掷骰。设置同一个种子即可复现整局。
+# - stream(name)：取某个流（同名返回同一对象，可长期持有）
+# - seed(value)：重设局种子，已发出的流原地重新播种，持有者无需重新获取
+# - fork(name)：派生一个独立的子服务（模拟/子战斗用），只做一次哈希，开销很小
+# 环境变量 HELL_LAST_SEED 可指定启动时的种子，方便调试和基准测试。
+
+MAP_DECK = "map_deck"
+PASSAGE_DECK = "passage_deck"
+EVENT_DECK = "event_deck"
+BRANCHING = "branching"
+PLAYER_DICE = "player_dice"
+NPC_DICE = "npc_dice"
+DECK_SHUFFLE = "deck_shuffle"
+
+STREAMS = (MAP_DECK, PASSAGE_DECK, EVENT_DECK, BRANCHING, PLAYER_DICE, NPC_DICE, DECK_SHUFFLE)
+
+SEED_ENV = "HELL_LAST_SEED"
+
+
+def derive_seed(seed, name):
+    """由父种子和名字派生 64 位子种子"""
+    digest = hashlib.blake2b(f"{seed}/{name}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class RngService:
+    def __init__(self, seed=None):
+        self.seed = secrets.randbits(64) if seed is None else seed
+        self._streams = {}
+
+    def stream(self, name):
+        rng = self._streams.get(name)
+        if rng is None:
+            rng = random.Random(derive_seed(self.seed, name))
+            self._streams[name] = rng
+        return rng
+
+    def reseed(self, seed=None):
+        """重设种子；已发出的流原地重新播种"""
+        self.seed = secrets.randbits(64) if seed is None else seed
+        for name, rng in self._streams.items():
+            rng.seed(derive_seed(self.seed, name))
+        return self.seed
+
+    def fork(self, name):
+        """派生独立的子服务（同一父种子 + 同名 → 同一序列）"""
+        return RngService(derive_seed(self.seed, f"fork:{name}"))
+
+    def __repr__(self):
+        return f"RngService(seed={self.seed})"
+
+
+def _initial_seed():
+    value = os.environ.get(SEED_ENV, "").strip()
+    if not value:
+        return None
+    try:
+        return int(value, 0)
+    except ValueError:
+        return value  # 非数字种子按字符串派生
+
+SERVICE = RngService(_initial_seed())
+
+def stream(name):
+    return SERVICE.stream(name)
+
+def seed(value=None):
+    """设置本局种子（None=随机），返回实际使用的种子"""
+    return SERVICE.reseed(value)
+
+def current_seed():
+    return SERVICE.seed
+
+def fork(name):
+    return SERVICE.fork(name)
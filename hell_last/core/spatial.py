@@ -0,0 +1,49 @@
+import math
+
+# ===================== 均匀网格空间索引（探索地图防重合） =====================
+# 平面按 cell_size × cell_size 切成格子，每个格子存落在其中的对象。
+# 查询半径 ≤ cell_size 时，命中的对象只可能在所在格子及周围 8 格里，
+# 所以 nearest() 只看 9 个格子，耗时和已绘制节点数无关（地图再大也是 O(1)）。
+# 格子用 dict 稀疏存放，树状地图向哪个方向延伸都不用预先分配。
+
+class GridIndex:
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self._cells = {}     # (cx, cy) -> [(x, y, obj), ...]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def add(self, obj, x, y):
+        self._cells.setdefault(self._cell(x, y), []).append((x, y, obj))
+        self._count += 1
+
+    def clear(self):
+        self._cells.clear()
+        self._count = 0
+
+    def nearest(self, x, y, radius=None):
+        """
+        距 (x, y) 严格小于 radius 的对象中最近的一个，没有返回 None
+        radius 默认等于 cell_size；更大的半径会多查几圈格子
+        """
+        if radius is None:
+            radius = self.cell_size
+        cx, cy = self._cell(x, y)
+        reach = max(1, math.ceil(radius / self.cell_size))
+        best, best_d = None, radius
+        cells = self._cells
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                bucket = cells.get((gx, gy))
+                if not bucket:
+                    continue
+                for ox, oy, obj in bucket:
+                    d = math.hypot(ox - x, oy - y)
+                    if d < best_d:
+                        best, best_d = obj, d
+        return best
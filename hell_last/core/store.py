@@ -0,0 +1,353 @@
+import hashlib
+import mmap
+import os
+import struct
+from collections.abc import MutableMapping
+
+from core import catalog
+
+# ===================== 二进制卡表（内存映射，零拷贝读取） =====================
+# 文件布局（小端）：
+#   文件头   : 魔数 b"HLCS" | 版本 u16 | 列数 u16 | 行数 u32 | 字符串堆偏移 u32 | 字符串堆大小 u32
+#              | 源文件 mtime_ns u64 | 源文件大小 u64 | 源文件 sha1（40字节 ascii）
+#   列描述   : 每列 4×u32 —— 列名堆偏移 | 列名长度 | 类型(0=整数, 1=字符串) | 列数据偏移
+#   列数据   : 整数列 = 行数×int64（按 8 字节对齐）；字符串列 = 行数×(堆偏移 u32, 长度 u32)
+#   字符串堆 : 所有字符串的 utf-8 字节
+# 多个进程 mmap 同一个只读文件，操作系统共享物理页，不再每个进程各持一份字典列表。
+# 哪些列存成整数由调用方声明（core.data 的 *_INT_FIELDS），不按数据猜：
+# 骰子表达式列（如 "6"/"D6" 混用）始终是字符串，声明的列里有非整数值时也存成字符串，交给调用方报错。
+# 文件名由「源文件路径 + mtime + 大小 + 整数列声明」派生：打开时只 stat 源文件、核对文件头，
+# 不经过 core.catalog；只有需要重新编译时才读 CSV，编译完立即放掉目录快照里的行数据。
+
+MAGIC = b"HLCS"
+STORE_VERSION = 2
+COL_INT = 0
+COL_STR = 1
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+_HEADER = struct.Struct("<4sHHIIIQQ40s")
+_COLUMN = struct.Struct("<IIII")
+
+_open_tables = {}   # {源文件绝对路径: CardTable}，进程内复用映射
+
+
+class StoreFormatError(ValueError):
+    """源表数据无法编译成二进制卡表（如整数超出 int64 范围）"""
+
+
+# ===================== 编译 =====================
+def _is_int(v):
+    try:
+        int(v)
+        return True
+    except ValueError:
+        return False
+
+def read_source_info(path):
+    """只读文件头，返回 (源文件 mtime_ns, 源文件大小, 源文件 sha1)；文件不存在或无效时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(head) < _HEADER.size:
+        return None
+    magic, version, *_, mtime_ns, size, sha1 = _HEADER.unpack(head)
+    if magic != MAGIC or version != STORE_VERSION:
+        return None
+    return mtime_ns, size, sha1.decode("ascii", "replace")
+
+def build_store(entry, out_path, int_columns=()):
+    """
+    把 core.catalog 的表条目编译成二进制卡表文件（先写临时文件再替换）
+    int_columns：要存成整数的列名；其中有非整数值的列仍存成字符串，超出 int64 范围抛 StoreFormatError
+    目标文件已是同一版本（mtime/大小/sha1 都相同，如另一个进程刚写好）时不重写：
+    它可能正被映射着，Windows 上不能替换已映射的文件
+    """
+    if read_source_info(out_path) == (entry["mtime_ns"], entry["size"], entry["sha1"]):
+        return False
+    header = entry["header"]
+    int_columns = set(int_columns)
+    # 字符串全部去掉首尾空白；声明为整数且整列都是整数（无空值）才存成整数列
+    rows = [[cell.strip() for cell in row] for row in entry["rows"]]
+    nrows = len(rows)
+    ncols = len(header)
+
+    heap = bytearray()
+    heap_index = {}
+
+    def intern(s):
+        if s not in heap_index:
+            heap_index[s] = (len(heap), len(s.encode("utf-8")))
+            heap.extend(s.encode("utf-8"))
+        return heap_index[s]
+
+    columns = []
+    offset = _HEADER.size + _COLUMN.size * ncols
+    for ci, name in enumerate(header):
+        values = [row[ci] for row in rows]
+        is_int = name in int_columns and all(_is_int(v) for v in values)
+        if is_int:
+            ints = [int(v) for v in values]
+            bad = next((v for v in ints if not INT_MIN <= v <= INT_MAX), None)
+            if bad is not None:
+                raise StoreFormatError(f"列【{name}】的数值超出范围：{bad}")
+            pad = -offset % 8
+            offset += pad
+            data = struct.pack(f"<{nrows}q", *ints)
+        else:
+            pad = 0
+            pairs = []
+            for v in values:
+                pairs.extend(intern(v))
+            data = struct.pack(f"<{nrows * 2}I", *pairs)
+        name_off, name_len = intern(name)
+        columns.append((name_off, name_len, COL_INT if is_int else COL_STR, offset, b"\0" * pad + data))
+        offset += len(data)
+
+    heap_offset = offset
+    blob = bytearray(_HEADER.pack(
+        MAGIC, STORE_VERSION, ncols, nrows, heap_offset, len(heap),
+        entry["mtime_ns"], entry["size"], entry["sha1"].encode("ascii"),
+    ))
+    for name_off, name_len, col_type, data_off, _ in columns:
+        blob += _COLUMN.pack(name_off, name_len, col_type, data_off)
+    for *_, data in columns:
+        blob += data
+    blob += heap
+
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+    os.replace(tmp_path, out_path)
+    return True
+
+
+# ===================== 读取 =====================
+class CardTable:
+    """
+    只读的内存映射卡表：按 (行号, 列名) 直接从映射里取值，不构造行字典
+    - 整数列返回 int，字符串列返回 str
+    - rows()/row() 返回轻量 CardRow 视图
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.int_columns = ()   # 由 open_table 记下编译时的整数列声明
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+        (magic, version, ncols, self.nrows, heap_off, heap_size,
+         self.source_mtime_ns, self.source_size, sha1) = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != STORE_VERSION:
+            raise ValueError(f"不是有效的二进制卡表：{path}")
+        self.source_sha1 = sha1.decode("ascii")
+        self._heap = self._buf[heap_off:heap_off + heap_size]
+
+        self.columns = []
+        self._cols = {}
+        for ci in range(ncols):
+            name_off, name_len, col_type, data_off = _COLUMN.unpack_from(
+                self._buf, _HEADER.size + ci * _COLUMN.size)
+            name = bytes(self._heap[name_off:name_off + name_len]).decode("utf-8")
+            if col_type == COL_INT:
+                data = self._buf[data_off:data_off + 8 * self.nrows].cast("q")
+            else:
+                data = self._buf[data_off:data_off + 8 * self.nrows].cast("I")
+            self.columns.append(name)
+            # 重名列（如地图卡表尾部的空列）保留第一个
+            self._cols.setdefault(name, (col_type, data))
+
+    def __len__(self):
+        return self.nrows
+
+    def has_column(self, name):
+        return name in self._cols
+
+    def require(self, *names):
+        """缺少必需列时抛 KeyError（和原来 row["列名"] 的报错方式一致）"""
+        for name in names:
+            if name not in self._cols:
+                raise KeyError(name)
+
+    def is_int_column(self, name):
+        return self._cols[name][0] == COL_INT
+
+    def value(self, index, name):
+        col_type, data = self._cols[name]
+        if col_type == COL_INT:
+            return data[index]
+        off = data[2 * index]
+        return bytes(self._heap[off:off + data[2 * index + 1]]).decode("utf-8")
+
+    def column(self, name):
+        """整列取值：整数列直接返回 memoryview（零拷贝），字符串列返回列表"""
+        col_type, data = self._cols[name]
+        if col_type == COL_INT:
+            return data
+        return [self.value(i, name) for i in range(self.nrows)]
+
+    def row(self, index, alias=None, defaults=None):
+        return CardRow(self, index, alias, defaults)
+
+    def rows(self, alias=None, defaults=None):
+        return [CardRow(self, i, alias, defaults) for i in range(self.nrows)]
+
+    def close(self):
+        self._heap.release()
+        for _, data in self._cols.values():
+            data.release()
+        self._buf.release()
+        self._mm.close()
+
+
+class CardRow(MutableMapping):
+    """
+    卡表中一行的字典兼容视图：
+    - alias：逻辑键 -> 列名（如 "name" -> "地图名"），为 None 时直接用列名
+    - defaults：表里没有的附加键（如地图卡的 "event"）
+    - 写入的值放进 overlay，只有被修改过的卡才会分配这个小字典
+    """
+    __slots__ = ("table", "index", "alias", "defaults", "overlay")
+
+    def __init__(self, table, index, alias=None, defaults=None):
+        self.table = table
+        self.index = index
+        self.alias = alias
+        self.defaults = defaults
+        self.overlay = None
+
+    def _column(self, key):
+        if self.alias is None:
+            return key
+        return self.alias.get(key)
+
+    def __getitem__(self, key):
+        if self.overlay is not None and key in self.overlay:
+            return self.overlay[key]
+        col = self._column(key)
+        if col is not None and self.table.has_column(col):
+            return self.table.value(self.index, col)
+        if self.defaults is not None and key in self.defaults:
+            return self.defaults[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if self.overlay is None:
+            self.overlay = {}
+        self.overlay[key] = value
+
+    def __delitem__(self, key):
+        if self.overlay is None or key not in self.overlay:
+            raise KeyError(key)
+        del self.overlay[key]
+
+    def _keys(self):
+        if self.alias is None:
+            keys = list(dict.fromkeys(self.table.columns))
+        else:
+            keys = [k for k, col in self.alias.items() if self.table.has_column(col)]
+        for extra in (self.defaults, self.overlay):
+            if extra:
+                keys.extend(k for k in extra if k not in keys)
+        return keys
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def copy(self):
+        """复制成普通字典（商店购买等需要独立修改的场景）"""
+        return {k: self[k] for k in self._keys()}
+
+    def __repr__(self):
+        return f"CardRow({self.copy()!r})"
+
+
+# ===================== 对外接口 =====================
+def _prefix(source_path):
+    """同一张源表各版本共用的文件名前缀：表名 + 源路径摘要（不同目录的同名表互不影响）"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return f"{stem}-{hashlib.sha1(source_path.encode('utf-8')).hexdigest()[:8]}-"
+
+def _store_path(source_path, st, int_columns):
+    key = f"{st.st_mtime_ns}|{st.st_size}|" + "|".join(sorted(int_columns))
+    version = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(catalog.get_cache_dir(), f"{_prefix(source_path)}{version}.hlcs")
+
+def _matches(table, st):
+    return table.source_mtime_ns == st.st_mtime_ns and table.source_size == st.st_size
+
+def _open_existing(out_path, st):
+    """磁盘上已有对应版本时直接 mmap；没有、损坏或与源文件对不上时返回 None"""
+    if not os.path.exists(out_path):
+        return None
+    try:
+        table = CardTable(out_path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if _matches(table, st):
+        return table
+    table.close()
+    return None
+
+def _prune(source_path, keep_path):
+    """
+    删掉同一张表的其他版本，以及同名表里文件头已失效的旧格式文件
+    （其他进程还映射着、删不掉的留到下次）
+    """
+    prefix = _prefix(source_path)
+    stem_prefix = prefix[:prefix.rindex("-", 0, -1) + 1]
+    cache_dir = os.path.dirname(keep_path)
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith(".hlcs") or not name.startswith(stem_prefix) or path == keep_path:
+            continue
+        if name.startswith(prefix) or read_source_info(path) is None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _replace_open(path, table):
+    old = _open_tables.get(path)
+    _open_tables[path] = table
+    if old is not None and old is not table:
+        old.close()   # 旧版本的映射和文件句柄立即释放
+    return table
+
+def open_table(filename, int_columns=()):
+    """
+    打开某张卡表的二进制映射（按需编译）：
+    - int_columns：存成整数的列名（见 build_store），声明不同视为不同版本
+    - 进程内已打开、声明相同且源文件 mtime/大小没变：直接复用
+    - 磁盘上已有对应 (mtime, 大小) 的版本：直接 mmap，不读 CSV、不加载目录快照
+    - 否则经 core.catalog 编译写出，删掉同一张表的旧版本，并放掉快照里的行数据
+    被替换掉的旧映射会关闭；文件不存在时抛出 FileNotFoundError
+    """
+    path = os.path.normcase(os.path.abspath(catalog.safe_path(filename)))
+    st = os.stat(path)
+    int_columns = tuple(sorted(set(int_columns)))
+    table = _open_tables.get(path)
+    if table is not None and table.int_columns == int_columns and _matches(table, st):
+        return table
+
+    out_path = _store_path(path, st, int_columns)
+    table = _open_existing(out_path, st)
+    if table is None:
+        try:
+            entry = catalog.get_table(path)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            build_store(entry, out_path, int_columns)
+        finally:
+            catalog.release_snapshot()   # 行数据已写进二进制文件，进程里不再保留
+        _prune(path, out_path)
+        table = CardTable(out_path)
+    table.int_columns = int_columns
+    return _replace_open(path, table)
+
+def opened(filename):
+    """进程内已打开的映射（不检查源文件是否变化）；没打开过返回 None"""
+    return _open_tables.get(os.path.normcase(os.path.abspath(catalog.safe_path(filename))))
@@ -0,0 +1,16 @@
+# ===================== 通用数值/字符串解析（原 battle_core 中的工具函数） =====================
+def safe_int(v, default=0):
+    try:
+        return int(str(v).strip())
+    except:
+        return default
+
+def safe_str(v, default=""):
+    return str(v).strip() if v else default
+
+def parse_check_condition(s):
+    """判定阈值 "3+" -> 3，无法解析时默认 3"""
+    s = safe_str(s)
+    if "+" in s:
+        return safe_int(s.replace("+", ""), 3)
+    return safe_int(s, 3)
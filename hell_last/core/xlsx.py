@@ -0,0 +1,132 @@
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree as ET
+
+# ===================== 轻量 xlsx 流式读取（只依赖标准库） =====================
+# xlsx 本质是 zip + XML：
+#   xl/workbook.xml            工作表列表
+#   xl/_rels/workbook.xml.rels 工作表 -> sheetN.xml 的映射
+#   xl/sharedStrings.xml       共享字符串表
+#   xl/worksheets/sheetN.xml   单元格数据
+# 这里用 iterparse 边读边丢弃元素，大表也不会整份载入内存。
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_T = f"{{{NS_MAIN}}}t"
+_SI = f"{{{NS_MAIN}}}si"
+_ROW = f"{{{NS_MAIN}}}row"
+_C = f"{{{NS_MAIN}}}c"
+_V = f"{{{NS_MAIN}}}v"
+_IS = f"{{{NS_MAIN}}}is"
+_RPH = f"{{{NS_MAIN}}}rPh"   # 注音（日文等），不属于正文
+
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+
+
+def _column_index(ref):
+    """单元格引用 "C5" -> 列下标 2"""
+    m = _CELL_REF.match(ref or "")
+    if not m:
+        return None
+    idx = 0
+    for ch in m.group(1):
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx - 1
+
+def _text_of(elem):
+    """拼接 <si>/<is> 里的所有 <t>（富文本会拆成多段），跳过注音"""
+    parts = []
+    for child in elem.iter():
+        if child.tag == _RPH:
+            continue
+        if child.tag == _T and child.text:
+            parts.append(child.text)
+    return "".join(parts)
+
+def _format_number(v):
+    """Excel 数值统一存成浮点文本：整数值去掉 .0"""
+    try:
+        f = float(v)
+    except ValueError:
+        return v
+    if f.is_integer() and "e" not in v.lower():
+        return str(int(f))
+    return v
+
+
+def _first_sheet_path(zf):
+    """按 workbook.xml 的顺序找到第一个工作表的 zip 路径"""
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheet = wb.find(f"{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet")
+    if sheet is None:
+        raise ValueError("工作簿中没有工作表")
+    rid = sheet.get(f"{{{NS_REL}}}id")
+    try:
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    except KeyError:
+        return "xl/worksheets/sheet1.xml"
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("Id") == rid:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    return "xl/worksheets/sheet1.xml"
+
+def _shared_strings(zf):
+    try:
+        stream = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with stream:
+        for _, elem in ET.iterparse(stream, events=("end",)):
+            if elem.tag == _SI:
+                strings.append(_text_of(elem))
+                elem.clear()
+    return strings
+
+
+def iter_rows(path):
+    """
+    逐行读取 xlsx 第一个工作表，产出字符串列表
+    - 空单元格补 ""，整行为空的行跳过
+    - 数值整数去掉 ".0"，布尔值转成 "TRUE"/"FALSE"
+    """
+    with zipfile.ZipFile(path) as zf:
+        strings = _shared_strings(zf)
+        with zf.open(_first_sheet_path(zf)) as stream:
+            for _, elem in ET.iterparse(stream, events=("end",)):
+                if elem.tag != _ROW:
+                    continue
+                values = {}
+                next_idx = 0
+                for c in elem.iter(_C):
+                    idx = _column_index(c.get("r"))
+                    if idx is None:
+                        idx = next_idx
+                    next_idx = idx + 1
+                    t = c.get("t")
+                    if t == "inlineStr":
+                        is_elem = c.find(_IS)
+                        value = _text_of(is_elem) if is_elem is not None else ""
+                    else:
+                        v = c.find(_V)
+                        raw = v.text if v is not None and v.text is not None else ""
+                        if t == "s":
+                            value = strings[int(raw)] if raw else ""
+                        elif t == "b":
+                            value = "TRUE" if raw == "1" else "FALSE"
+                        elif t in ("str", "e"):
+                            value = raw
+                        else:
+                            value = _format_number(raw) if raw else ""
+                    values[idx] = value
+                elem.clear()
+                if not any(v.strip() for v in values.values()):
+                    continue
+                width = max(values) + 1
+                yield [values.get(i, "") for i in range(width)]
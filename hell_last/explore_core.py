@@ -1,10 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import csv
-import random
 import sys
-import math
+import contextlib
 import os  # 新增：处理路径
+from core import data  # 无界面数据层：只抛异常，弹窗由本模块负责
+from core import rng  # 按子系统分流的随机数（地图/通道/事件牌堆、分支数）
+from core import spatial  # 节点网格索引（防重合检测）
 
 # ===================== 核心修复：绝对路径处理 =====================
 def get_script_dir():
@@ -28,12 +29,13 @@ PLAYER_STATUS = {            # 新增：存储玩家状态（血量/属性），
 
 # 游戏核心参数
 game_current_pos = None       # 当前玩家位置：MapNode/Passage对象
-game_visited_nodes = []       # 已访问节点列表（用于判断是否二次进图）
+game_visited_nodes = []       # 已访问节点列表（去重，按首次到达顺序；到达次数记在 node.visits）
 game_all_nodes = []           # 所有已绘制节点列表（用于防重合检测）
 game_all_passages = []        # 所有已绘制通道列表
 game_map_deck = None          # 地图牌库
 game_passage_deck = None      # 通道牌库
 game_event_deck = None        # 事件牌库
+game_open_events = 0          # 事件牌库中未完成的事件数（抽事件时递减，统计栏直接读）
 
 # 树状布局参数（可微调）
 ROOT_X = 200               # 根节点x坐标
@@ -44,6 +46,15 @@ NODE_RADIUS = 25           # 节点圆圈半径
 COLLISION_THRESHOLD = 50   # 碰撞检测阈值：小于该值判定为重合
 TOKEN_RADIUS = 8           # 玩家Token半径（通道中显示更小更精准）
 
+game_node_index = spatial.GridIndex(COLLISION_THRESHOLD)  # 已绘制节点的网格索引（格宽 = 碰撞阈值）
+game_map_bounds = None     # 已绘制图形的外接矩形 (x1, y1, x2, y2)，绘制时增量扩展，代替 canvas.bbox("all")
+BOUNDS_PAD = 12            # 外接矩形留白（圆圈边框、箭头、通道名称的超出部分）
+
+# 绘制事务：draw_batch() 期间滚动区域/玩家Token/详情栏只标记，退出时各刷新一次
+_draw_depth = 0
+_scroll_dirty = False
+_token_dirty = False
+
 # UI控件（全局，供main.py调用）
 root = None
 canvas = None     # 绘图画布（树状小地图）
@@ -56,76 +67,32 @@ hp_label = None   # 新增：玩家血量显示标签
 # 图形ID映射（画布ID -> 游戏对象）
 id_to_node = {}    # 画布ID -> MapNode对象
 id_to_passage = {} # 画布ID -> Passage对象
+hover_target = None  # 鼠标当前悬停的 MapNode/Passage（画布统一分发事件，见 on_canvas_motion）
+HIT_SLOP = 2         # 点击/悬停判定的容差（像素）
 
 # ===================== 卡牌加载函数（修复路径） =====================
-def load_map_cards(filename):
-    maps = []
+# 返回 core.records 中的 slots 记录（字典兼容），字段映射见 core.data
+def _load_cards(loader, filename, label, unit):
     file_path = safe_path(filename)  # 转绝对路径
     try:
-        with open(file_path, encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                maps.append({
-                    "name": row["地图名"],
-                    "description": row["描述"],
-                    "effect": row["地图效果"],
-                    "event": None  # 存储该节点触发的事件
-                })
-        print(f"✅ 成功加载 {len(maps)} 张地图卡")
-        return maps
-    except FileNotFoundError:
-        messagebox.showerror("文件错误", f"未找到地图文件：{file_path}")
+        cards = loader(file_path)
+    except data.MissingCardFileError:
+        messagebox.showerror("文件错误", f"未找到{label}文件：{file_path}")
         sys.exit()
-    except KeyError as e:
-        messagebox.showerror("格式错误", f"地图CSV缺少列名：{e}")
+    except data.CardDataError as e:
+        messagebox.showerror("格式错误", str(e))
         sys.exit()
+    print(f"✅ 成功加载 {len(cards)} {unit}{label}卡")
+    return cards
+
+def load_map_cards(filename):
+    return _load_cards(data.get_map_cards, filename, "地图", "张")
 
 def load_event_cards(filename):
-    events = []
-    file_path = safe_path(filename)  # 转绝对路径
-    try:
-        with open(file_path, encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                events.append({
-                    "name": row["事件名"],
-                    "description": row["描述"],
-                    "type": row.get("类型", ""),
-                    "effect": row["效果"],
-                    "关键词": row["关键词"],  # 战斗触发关键词
-                    "角色": row.get("角色", ""),
-                    "数量": row.get("数量", ""),
-                    "completed": False
-                })
-        print(f"✅ 成功加载 {len(events)} 张事件卡")
-        return events
-    except FileNotFoundError:
-        messagebox.showerror("文件错误", f"未找到事件文件：{file_path}")
-        sys.exit()
-    except KeyError as e:
-        messagebox.showerror("格式错误", f"事件CSV缺少列名：{e}")
-        sys.exit()
+    return _load_cards(data.get_event_cards, filename, "事件", "张")
 
 def load_passage_cards(filename):
-    passage = []
-    file_path = safe_path(filename)  # 转绝对路径
-    try:
-        with open(file_path, encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                passage.append({
-                    "name": row["通道名"],
-                    "description": row["描述"],
-                    "effect": row["效果"]
-                })
-        print(f"✅ 成功加载 {len(passage)} 张通道卡")
-        return passage
-    except FileNotFoundError:
-        messagebox.showerror("文件错误", f"未找到通道文件：{file_path}")
-        sys.exit()
-    except KeyError as e:
-        messagebox.showerror("格式错误", f"通道CSV缺少列名：{e}")
-        sys.exit()
+    return _load_cards(data.get_passage_cards, filename, "通道", "张")
 
 # ===================== 游戏类定义 ======================
 class MapNode:
@@ -135,6 +102,7 @@ class MapNode:
         self.children = []           # 子节点列表
         self.parent = None           # 父节点
         self.is_generated = False    # 子节点是否已生成
+        self.visits = 0              # 玩家到达该节点的次数（record_visit 维护）
         # 图形属性
         self.x = x
         self.y = y
@@ -171,11 +139,13 @@ def update_detail_text():
         content = f"【地图名称】{node.map['name']}\n\n【地图描述】{node.map['description']}\n\n【地图效果】{node.map['effect']}\n\n"
         if node.map['event']:
             event = node.map['event']
-            if node in game_visited_nodes and game_visited_nodes.count(node) >= 2:
+            if node.visits >= 2:
                 event_title = "【触发事件-已完成】"
             else:
                 event_title = "【触发事件】"
             content += f"{event_title} {event['name']}\n\n【事件描述】{event['description']}\n\n【事件类型】{event['type']}\n\n【事件效果】{event['effect']}"
+            if event_title == "【触发事件】" and event.is_battle:
+                content += battle_preview_text(event)
         else:
             content += "【触发事件】暂无专属事件"
     elif isinstance(game_current_pos, Passage):
@@ -186,12 +156,29 @@ def update_detail_text():
     detail_text.config(state=tk.DISABLED)
     update_stat()
 
+_battle_core = None   # 第一次需要战斗预估时导入的 battle_core 模块
+
+def battle_preview_text(event):
+    """战斗事件的胜率预估（精确解，battle_core 按敌人/玩家状态缓存）；战斗模块不可用时不显示"""
+    global _battle_core
+    try:
+        if _battle_core is None:
+            import battle_core
+            _battle_core = battle_core
+        forecast = _battle_core.preview_battle(event)
+    except Exception as e:
+        print(f"战斗预估失败：{e}")
+        return ""
+    if forecast is None:
+        return ""
+    return f"\n\n【战斗预估】{forecast}（约 {forecast.expected_rounds:.0f} 回合）"
+
 def update_stat():
-    """更新顶部探索统计（新增血量显示）"""
-    visited_num = len(set(game_visited_nodes))
+    """更新顶部探索统计（新增血量显示）；各项都是随事件维护的计数，不扫描列表"""
+    visited_num = len(game_visited_nodes)
     draw_num = len(game_all_nodes)
     remain_map = len(game_map_deck) if game_map_deck else 0
-    remain_event = len([e for e in game_event_deck if not e['completed']]) if game_event_deck else 0
+    remain_event = game_open_events
     
     # 玩家血量信息
     hp_text = f"💖 血量：{PLAYER_STATUS['current_hp']}/{PLAYER_STATUS['max_hp']}" if PLAYER_STATUS['max_hp'] > 0 else ""
@@ -202,12 +189,37 @@ def update_stat():
 
 # ===================== 图形绘制核心函数 =====================
 def check_collision(x, y):
-    """碰撞检测"""
-    for node in game_all_nodes:
-        distance = math.hypot(node.x - x, node.y - y)
-        if distance < COLLISION_THRESHOLD:
-            return node
-    return None
+    """碰撞检测：距离小于阈值的最近节点（只查周围 9 个格子）"""
+    return game_node_index.nearest(x, y, COLLISION_THRESHOLD)
+
+@contextlib.contextmanager
+def draw_batch():
+    """
+    绘制事务（可嵌套）：期间 draw_map_node / draw_passage 照常建图形并登记，
+    draw_player_token 和滚动区域更新排队，最外层退出时统一执行一次
+    """
+    global _draw_depth, _token_dirty
+    _draw_depth += 1
+    try:
+        yield
+    finally:
+        _draw_depth -= 1
+        if _draw_depth == 0:
+            if _token_dirty:
+                _token_dirty = False
+                draw_player_token()   # 会顺带更新滚动区域
+            elif _scroll_dirty:
+                update_canvas_scroll()
+
+def extend_map_bounds(x1, y1, x2, y2):
+    """把新图形的范围并入外接矩形（只看新图形，O(1)）"""
+    global game_map_bounds
+    x1, y1, x2, y2 = x1 - BOUNDS_PAD, y1 - BOUNDS_PAD, x2 + BOUNDS_PAD, y2 + BOUNDS_PAD
+    if game_map_bounds is None:
+        game_map_bounds = (x1, y1, x2, y2)
+    else:
+        bx1, by1, bx2, by2 = game_map_bounds
+        game_map_bounds = (min(bx1, x1), min(by1, y1), max(bx2, x2), max(by2, y2))
 
 def draw_map_node(node):
     """绘制地图节点"""
@@ -222,11 +234,10 @@ def draw_map_node(node):
     )
     node.graph_id = (circle_id, name_id)
     for gid in node.graph_id:
-        id_to_node[gid] = node
-        canvas.tag_bind(gid, "<Button-1>", lambda e, n=node: click_node(n))
-        canvas.tag_bind(gid, "<Enter>", lambda e, c=circle_id: canvas.itemconfig(c, fill="#E6F7FF"))
-        canvas.tag_bind(gid, "<Leave>", lambda e, c=circle_id: canvas.itemconfig(c, fill="white"))
+        id_to_node[gid] = node   # 点击/悬停由画布统一分发，不再逐个 tag_bind
     game_all_nodes.append(node)
+    game_node_index.add(node, node.x, node.y)
+    extend_map_bounds(node.x - node.radius, node.y - node.radius, node.x + node.radius, node.y + node.radius)
     update_canvas_scroll()
 
 def draw_passage(passage):
@@ -249,14 +260,17 @@ def draw_passage(passage):
     passage.graph_id = (line_id, name_id)
     for gid in passage.graph_id:
         id_to_passage[gid] = passage
-        canvas.tag_bind(gid, "<Button-1>", lambda e, p=passage: click_passage(p))
-        canvas.tag_bind(gid, "<Enter>", lambda e, l=line_id: canvas.itemconfig(l, width=4, fill="#FF6600"))
-        canvas.tag_bind(gid, "<Leave>", lambda e, l=line_id: canvas.itemconfig(l, width=2, fill="#000000"))
     game_all_passages.append(passage)
+    extend_map_bounds(min(passage.x1, passage.x2, passage.mid_x - 40), min(passage.y1, passage.y2, passage.mid_y - 10),
+                      max(passage.x1, passage.x2, passage.mid_x + 40), max(passage.y1, passage.y2))
     update_canvas_scroll()
 
 def draw_player_token():
-    """绘制玩家Token"""
+    """绘制玩家Token（绘制事务中只标记，事务结束时画一次）"""
+    global _token_dirty
+    if _draw_depth:
+        _token_dirty = True
+        return
     for gid in canvas.find_withtag("player_token"):
         canvas.delete(gid)
     if game_current_pos is None:
@@ -278,9 +292,55 @@ def draw_player_token():
     update_canvas_scroll()
     update_detail_text()
 
+# ===================== 画布事件分发 =====================
+# 整个画布只绑定一次 <Button-1>/<Motion>/<Leave>：用 find_overlapping 找到光标下的图形，
+# 再查 id_to_node / id_to_passage 得到对象；悬停高亮只记一个 hover_target。
+# 地图再大也不会为每个图形新建 Tcl 回调，重新开局也不用重新绑定。
+def target_at(event):
+    """光标下最上层的地图节点/通道（玩家Token等未登记的图形跳过），没有返回 None"""
+    x, y = canvas.canvasx(event.x), canvas.canvasy(event.y)
+    for gid in reversed(canvas.find_overlapping(x - HIT_SLOP, y - HIT_SLOP, x + HIT_SLOP, y + HIT_SLOP)):
+        target = id_to_node.get(gid) or id_to_passage.get(gid)
+        if target is not None:
+            return target
+    return None
+
+def set_hover(target):
+    """切换悬停高亮：只改旧目标和新目标两处"""
+    global hover_target
+    if target is hover_target:
+        return
+    old, hover_target = hover_target, target
+    if isinstance(old, MapNode):
+        canvas.itemconfig(old.graph_id[0], fill="white")
+    elif isinstance(old, Passage):
+        canvas.itemconfig(old.graph_id[0], width=2, fill="#000000")
+    if isinstance(target, MapNode):
+        canvas.itemconfig(target.graph_id[0], fill="#E6F7FF")
+    elif isinstance(target, Passage):
+        canvas.itemconfig(target.graph_id[0], width=4, fill="#FF6600")
+
+def on_canvas_click(event):
+    target = target_at(event)
+    if isinstance(target, MapNode):
+        click_node(target)
+    elif isinstance(target, Passage):
+        click_passage(target)
+
+def on_canvas_motion(event):
+    set_hover(target_at(event))
+
+def on_canvas_leave(event):
+    set_hover(None)
+
 def update_canvas_scroll():
-    """更新画布滚动区域"""
-    all_coords = canvas.bbox("all")
+    """更新画布滚动区域（用增量维护的外接矩形；绘制事务中只标记）"""
+    global _scroll_dirty
+    if _draw_depth:
+        _scroll_dirty = True
+        return
+    _scroll_dirty = False
+    all_coords = game_map_bounds
     if all_coords:
         canvas.config(scrollregion=all_coords)
     if game_current_pos:
@@ -298,7 +358,7 @@ def generate_child_nodes(parent_node):
         return
     parent_node.is_generated = True
 
-    base_num = random.randint(1, 3)
+    base_num = rng.stream(rng.BRANCHING).randint(1, 3)
     if parent_node.map["name"] == "迷雾森林" and base_num > 1:
         num_passages = 1
         show_tip("🌫️ 迷雾森林效果：仅生成1条通道！", "#0099ff", 2500)
@@ -316,41 +376,57 @@ def generate_child_nodes(parent_node):
     elif num_passages >= 3:
         y_offsets = [-BRANCH_STEP, 0, BRANCH_STEP][:num_passages]
 
-    for i, y_offset in enumerate(y_offsets):
-        if not game_passage_deck:
-            show_tip("🚫 通道牌库为空，停止生成！", "#ff9900", 3000)
-            break
-        child_x = parent_node.x + DEPTH_STEP
-        child_y = parent_node.y + y_offset
-        child_depth = parent_node.depth + 1
+    with draw_batch():   # 一次分支生成只更新一次滚动区域/Token
+        for i, y_offset in enumerate(y_offsets):
+            if not game_passage_deck:
+                show_tip("🚫 通道牌库为空，停止生成！", "#ff9900", 3000)
+                break
+            child_x = parent_node.x + DEPTH_STEP
+            child_y = parent_node.y + y_offset
+            child_depth = parent_node.depth + 1
         
-        collision_node = check_collision(child_x, child_y)
-        passage_card = game_passage_deck.pop()
+            collision_node = check_collision(child_x, child_y)
+            passage_card = game_passage_deck.pop()
         
-        if collision_node:
-            show_tip(f"📍 坐标重合，连接{parent_node.map['name']}与{collision_node.map['name']}", "#0099ff", 2500)
-            new_node = collision_node
-        else:
-            if not game_map_deck:
-                show_tip("🚫 地图牌库为空，无法生成新节点！", "#ff9900", 3000)
-                break
-            map_card = game_map_deck.pop()
-            new_node = MapNode(map_card, child_x, child_y, child_depth)
-            new_node.parent = parent_node
-            parent_node.children.append(new_node)
-            draw_map_node(new_node)
+            if collision_node:
+                show_tip(f"📍 坐标重合，连接{parent_node.map['name']}与{collision_node.map['name']}", "#0099ff", 2500)
+                new_node = collision_node
+            else:
+                if not game_map_deck:
+                    show_tip("🚫 地图牌库为空，无法生成新节点！", "#ff9900", 3000)
+                    break
+                map_card = game_map_deck.pop()
+                new_node = MapNode(map_card, child_x, child_y, child_depth)
+                new_node.parent = parent_node
+                parent_node.children.append(new_node)
+                draw_map_node(new_node)
         
-        passage = Passage(passage_card, parent_node, new_node)
-        parent_node.passages.append(passage)
-        draw_passage(passage)
+            passage = Passage(passage_card, parent_node, new_node)
+            parent_node.passages.append(passage)
+            draw_passage(passage)
 
 # ===================== 核心交互逻辑 =====================
+def record_visit(node):
+    """记一次到达：首次到达时加入 game_visited_nodes，返回该节点累计到达次数"""
+    node.visits += 1
+    if node.visits == 1:
+        game_visited_nodes.append(node)
+    return node.visits
+
+def draw_event_card():
+    """从事件牌库抽一张，同时维护未完成事件数"""
+    global game_open_events
+    game_event = game_event_deck.pop()
+    if not game_event['completed']:
+        game_open_events -= 1
+    return game_event
+
 def click_node(target_node):
     """点击地图节点逻辑"""
     global game_current_pos
     if game_current_pos is None:
         game_current_pos = target_node
-        game_visited_nodes.append(target_node)
+        record_visit(target_node)
         draw_player_token()
         explore_node(target_node)
         return
@@ -362,9 +438,9 @@ def click_node(target_node):
     if isinstance(game_current_pos, Passage):
         if game_current_pos.start == target_node or game_current_pos.end == target_node:
             game_current_pos = target_node
-            game_visited_nodes.append(target_node)
+            visits = record_visit(target_node)
             draw_player_token()
-            if game_visited_nodes.count(target_node) == 1:
+            if visits == 1:
                 explore_node(target_node)
                 show_tip(f"🔍 首次探索{target_node.map['name']}，触发专属事件！", "#0099ff", 2500)
             else:
@@ -414,13 +490,14 @@ def explore_node(node):
     
     # 第二步：处理事件（变量名改为game_event，避免和tkinter.Event冲突）
     if game_event_deck and not node.map['event']:
-        game_event = game_event_deck.pop()
+        game_event = draw_event_card()
         node.map['event'] = game_event
         show_tip(f"🎴 触发专属事件：{game_event['name']}", "#ffcc00", 2500)
         
         # 触发战斗（传递game_event而非event，同步玩家状态）
-        if "战斗" in game_event["关键词"] or "怪物" in game_event["关键词"] or "敌人" in game_event["关键词"]:
+        if game_event.is_battle:
             show_tip(f"⚔️ 触发战斗事件：{game_event['name']}，准备使用已购卡牌！", "#ff0000", 3000)
+            update_detail_text()  # 开战前先显示胜率预估
             try:
                 import battle_core as bc
                 # 传递战斗参数 + 同步玩家状态
@@ -446,8 +523,8 @@ def explore_node(node):
         show_tip("📭 该地图无专属事件，直接生成通道！", "#0099ff", 2500)
     
     # 游戏结束判断
-    if not game_map_deck and len(set(game_visited_nodes)) == len(game_all_nodes):
-        show_tip(f"🎮 游戏结束！已探索所有{len(set(game_visited_nodes))}个地图！", "#ff00ff", 5000)
+    if not game_map_deck and len(game_visited_nodes) == len(game_all_nodes):
+        show_tip(f"🎮 游戏结束！已探索所有{len(game_visited_nodes)}个地图！", "#ff00ff", 5000)
 
 # ===================== 游戏UI构建 =====================
 def create_game_ui():
@@ -485,6 +562,9 @@ def create_game_ui():
     canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     canvas_xscroll.config(command=canvas.xview)
     canvas_yscroll.config(command=canvas.yview)
+    canvas.bind("<Button-1>", on_canvas_click)
+    canvas.bind("<Motion>", on_canvas_motion)
+    canvas.bind("<Leave>", on_canvas_leave)
 
     # 提示标签
     tip_label = tk.Label(canvas, bg="#ffffff", bd=0)
@@ -519,7 +599,7 @@ def create_game_ui():
 def init_game():
     """初始化探索游戏（修复路径）"""
     global game_current_pos, game_visited_nodes, game_all_nodes, game_all_passages
-    global game_map_deck, game_passage_deck, game_event_deck
+    global game_map_deck, game_passage_deck, game_event_deck, game_map_bounds, hover_target, game_open_events
 
     # 加载卡牌（使用绝对路径）
     try:
@@ -533,15 +613,22 @@ def init_game():
         messagebox.showerror("格式错误", f"CSV文件缺少列名：{e}")
         sys.exit()
 
-    # 洗牌
-    random.shuffle(game_map_deck)
-    random.shuffle(game_passage_deck)
-    random.shuffle(game_event_deck)
+    # 洗牌（每个牌堆独立的随机数流；设置 HELL_LAST_SEED 可复现整局）
+    print(f"本局随机种子：{rng.current_seed()}")
+    rng.stream(rng.MAP_DECK).shuffle(game_map_deck)
+    rng.stream(rng.PASSAGE_DECK).shuffle(game_passage_deck)
+    rng.stream(rng.EVENT_DECK).shuffle(game_event_deck)
 
     # 初始化变量
     game_visited_nodes = []
+    game_open_events = sum(1 for e in game_event_deck if not e['completed'])
     game_all_nodes = []
     game_all_passages = []
+    game_node_index.clear()
+    game_map_bounds = None
+    id_to_node.clear()
+    id_to_passage.clear()
+    hover_target = None
     game_current_pos = None
 
     # 创建根节点
@@ -1,67 +1,59 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import csv
-import random
 import sys
-import math
+from core import catalog  # 卡表统一走目录缓存，不重复解析CSV
+from core import rng  # 按子系统分流的随机数
+from core import spatial  # 节点网格索引（防重合检测）
 
 # ===================== 卡牌加载函数 =====================
 def load_map_cards(filename):
     maps = []
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            maps.append({
-                "name": row["地图名"],
-                "description": row["描述"],
-                "effect": row["地图效果"],
-                "event": None  # 存储该节点触发的事件
-            })
+    for row in catalog.load_rows(filename):
+        maps.append({
+            "name": row["地图名"],
+            "description": row["描述"],
+            "effect": row["地图效果"],
+            "event": None  # 存储该节点触发的事件
+        })
     return maps
 
 def load_event_cards(filename):
     events = []
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            events.append({
-                "name": row["事件名"],
-                "description": row["描述"],
-                "type": row.get("类型", ""),  # 保留原type列，不影响其他功能
-                "effect": row["效果"],
-                "关键词": row["关键词"],  # 核心：读取关键词列
-                "角色": row.get("角色", ""),  # 战斗专属：敌人角色
-                "数量": row.get("数量", ""),  # 战斗专属：敌人数量
-                "completed": False  # 仅二次访问地图时设为True
-            })
+    for row in catalog.load_rows(filename):
+        events.append({
+            "name": row["事件名"],
+            "description": row["描述"],
+            "type": row.get("类型", ""),  # 保留原type列，不影响其他功能
+            "effect": row["效果"],
+            "关键词": row["关键词"],  # 核心：读取关键词列
+            "角色": row.get("角色", ""),  # 战斗专属：敌人角色
+            "数量": row.get("数量", ""),  # 战斗专属：敌人数量
+            "completed": False  # 仅二次访问地图时设为True
+        })
     return events
 
 def load_passage_cards(filename):
     passage = []
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            passage.append({
-                "name": row["通道名"],
-                "description": row["描述"],
-                "effect": row["效果"]
-            })
+    for row in catalog.load_rows(filename):
+        passage.append({
+            "name": row["通道名"],
+            "description": row["描述"],
+            "effect": row["效果"]
+        })
     return passage
 
 def load_enemy_cards(filename):
     """加载敌人卡（enemycharacter.csv），返回字典：{name: 敌人属性}"""
     enemies = {}
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            enemies[row["name"]] = {
-              #  "number": int(row["number"]),
-                "HP": int(row["HP"]),
-                "Damage": int(row["Damage"]),
-                "Hit": row["Hit"],
-                "doge": row["doge"],
-                "current_HP": int(row["HP"])  # 新增当前血量，战斗中实时修改
-            }
+    for row in catalog.load_rows(filename):
+        enemies[row["name"]] = {
+          #  "number": int(row["number"]),
+            "HP": int(row["HP"]),
+            "Damage": int(row["Damage"]),
+            "Hit": row["Hit"],
+            "doge": row["doge"],
+            "current_HP": int(row["HP"])  # 新增当前血量，战斗中实时修改
+        }
     return enemies
 
 # 新增敌人卡全局加载（和地图/事件/通道卡同级别）
@@ -87,9 +79,9 @@ except KeyError as e:
     sys.exit()
 
 # 洗牌：随机打乱卡牌顺序，保证每次探索不同
-random.shuffle(MAP_CARDS)
-random.shuffle(PASSAGE_CARDS)
-random.shuffle(EVENT_CARDS)
+rng.stream(rng.MAP_DECK).shuffle(MAP_CARDS)
+rng.stream(rng.PASSAGE_DECK).shuffle(PASSAGE_CARDS)
+rng.stream(rng.EVENT_DECK).shuffle(EVENT_CARDS)
 
 # ===================== 游戏类定义（封装节点/通道属性）=====================
 class MapNode:
@@ -136,6 +128,8 @@ NODE_RADIUS = 25           # 节点圆圈半径
 COLLISION_THRESHOLD = 50   # 碰撞检测阈值：小于该值判定为重合
 TOKEN_RADIUS = 8           # 玩家Token半径（通道中显示更小更精准）
 
+game_node_index = spatial.GridIndex(COLLISION_THRESHOLD)  # 已绘制节点的网格索引（格宽 = 碰撞阈值）
+
 # UI控件
 root = None
 canvas = None     # 绘图画布（树状小地图）
@@ -211,12 +205,8 @@ def update_stat():
 
 # ===================== 图形绘制核心函数 =====================
 def check_collision(x, y):
-    """碰撞检测：检测新坐标是否与已知节点重合，返回重合节点/None"""
-    for node in game_all_nodes:
-        distance = math.hypot(node.x - x, node.y - y)
-        if distance < COLLISION_THRESHOLD:
-            return node
-    return None
+    """碰撞检测：检测新坐标是否与已知节点重合，返回距离最近的重合节点/None（网格索引，只查周围 9 格）"""
+    return game_node_index.nearest(x, y, COLLISION_THRESHOLD)
 
 def draw_map_node(node):
     """绘制地图节点（仅圆圈+名称），绑定点击/悬停事件"""
@@ -242,6 +232,7 @@ def draw_map_node(node):
         canvas.tag_bind(gid, "<Leave>", lambda e, c=circle_id: canvas.itemconfig(c, fill="white"))
     # 将节点加入已绘制列表
     game_all_nodes.append(node)
+    game_node_index.add(node, node.x, node.y)  # 登记到网格索引，供碰撞检测
     update_canvas_scroll()
 
 def draw_passage(passage):
@@ -534,7 +525,7 @@ def generate_child_nodes(parent_node):
     parent_node.is_generated = True  # 标记为已生成，防止重复生成
 
     # 处理地图效果：修改生成的通道数
-    base_num = random.randint(1, 3)
+    base_num = rng.stream(rng.BRANCHING).randint(1, 3)
     if parent_node.map["name"] == "迷雾森林" and base_num > 1:
         num_passages = 1
         show_tip("🌫️ 迷雾森林效果：仅生成1条通道！", "#0099ff", 2500)
@@ -747,6 +738,7 @@ def init_game():
     game_visited_nodes = []
     game_all_nodes = []
     game_all_passages = []
+    game_node_index.clear()
     game_current_pos = None
 
     # 创建根节点（深度0，树状起点）
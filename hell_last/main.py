@@ -1,10 +1,14 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk
 import player_data as pd
 import explore_core as ec
 import os
 import sys
 import weapon_data as wd
+from core import analytics  # 武器×敌人预计伤害表（按卡表版本缓存）
+from core import catalog
+from core import data
+from core import listdiff
 from typing import Optional, Callable
 # ===================== 【核心修复】永远定位到当前代码所在文件夹 =====================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,10 +24,9 @@ PURCHASED_CARDS = {}
 
 # ===================== 武器商店 =====================
 def show_weapon_shop(after_callback: Optional[Callable] = None) -> None:
-    try:
-        wd.load_weapons()
-    except Exception as e:
-        messagebox.showerror("加载失败", f"读取武器数据出错：{e}")
+    error = wd.load_weapons()  # 卡表没变时直接命中缓存
+    if error:
+        messagebox.showerror("加载失败", f"读取武器数据出错：{error}")
         if after_callback:
             after_callback()
         return
@@ -44,6 +47,41 @@ def show_weapon_shop(after_callback: Optional[Callable] = None) -> None:
     )
     title.pack(pady=10)
     
+    # ===================== 排序/筛选（数值来自 core.analytics 预计算表，不在这里计算） =====================
+    try:
+        matrix = analytics.weapon_matrix()
+    except (data.CardDataError, OSError) as e:  # 敌人表缺失/格式错误等：商店照常可用，只是没有分析数据
+        print(f"⚠️ 武器分析表不可用：{e}")
+        matrix = None
+
+    ALL_ENEMIES = "全部敌人（平均）"
+    SORT_OPTIONS = {
+        "默认顺序": None,
+        "每回合伤害（高→低）": lambda s: -s[0],
+        "抵消命中（高→低）": lambda s: -s[1],
+        "承受伤害（低→高）": lambda s: s[2],
+    }
+
+    filter_frame = tk.Frame(shop_win, bg="#f5f5f5")
+    filter_frame.pack(fill="x", padx=20)
+
+    tk.Label(filter_frame, text="对手：", font=("微软雅黑", 11), bg="#f5f5f5").pack(side="left")
+    enemy_var = tk.StringVar(value=ALL_ENEMIES)
+    enemy_box = ttk.Combobox(filter_frame, textvariable=enemy_var, state="readonly", width=18,
+                             values=[ALL_ENEMIES] + list(matrix.enemies if matrix else ()))
+    enemy_box.pack(side="left", padx=(0, 15))
+
+    tk.Label(filter_frame, text="排序：", font=("微软雅黑", 11), bg="#f5f5f5").pack(side="left")
+    sort_var = tk.StringVar(value="默认顺序")
+    sort_box = ttk.Combobox(filter_frame, textvariable=sort_var, state="readonly", width=18,
+                            values=list(SORT_OPTIONS))
+    sort_box.pack(side="left", padx=(0, 15))
+
+    tk.Label(filter_frame, text="每回合伤害 ≥", font=("微软雅黑", 11), bg="#f5f5f5").pack(side="left")
+    min_damage_var = tk.StringVar(value="")
+    min_damage_entry = tk.Entry(filter_frame, textvariable=min_damage_var, width=6)
+    min_damage_entry.pack(side="left")
+
     listbox: tk.Listbox = tk.Listbox(
         shop_win,
         font=("微软雅黑", 12),
@@ -51,17 +89,45 @@ def show_weapon_shop(after_callback: Optional[Callable] = None) -> None:
         height=20
     )
     listbox.pack(fill="both", expand=True, padx=20, pady=10)
-    
-    if not wd.WEAPONS:
-        listbox.insert(tk.END, "⚠️ 未加载到任何武器数据！")
-    else:
-        for w in wd.WEAPONS:
+
+    shown = []  # 当前列表中显示的武器（与列表行一一对应）
+
+    def weapon_stats(w):
+        enemy = enemy_var.get()
+        stats = matrix.stats(w["武器名"], None if enemy == ALL_ENEMIES else enemy) if matrix else None
+        return stats or (0.0, 0.0, 0.0)
+
+    def refresh_list(*_) -> None:
+        try:
+            min_damage = float(min_damage_var.get()) if min_damage_var.get().strip() else None
+        except ValueError:
+            min_damage = None
+        rows = [(w, weapon_stats(w)) for w in wd.WEAPONS]
+        if min_damage is not None:
+            rows = [(w, st) for w, st in rows if st[0] >= min_damage]
+        key = SORT_OPTIONS.get(sort_var.get())
+        if key is not None:
+            rows.sort(key=lambda r: key(r[1]))
+
+        shown[:] = [w for w, _ in rows]
+        listbox.delete(0, tk.END)
+        if not wd.WEAPONS:
+            listbox.insert(tk.END, "⚠️ 未加载到任何武器数据！")
+            return
+        for w, (damage, absorbed, taken) in rows:
             text = (
                 f"{w['编号']}. {w['武器名']} | 伤害:{w['伤害']} | 命中:{w['命中']} | "
                 f"额外攻击:{w['额外攻击次数']} | 额外防御:{w['额外防御次数']} | "
                 f"格挡:{w['格挡']} | 特性:{w['特性']} | 描述:{w['描述']}"
             )
+            if matrix:
+                text += f" | 📈 每回合伤害:{damage:.2f} · 抵消命中:{absorbed:.2f} · 承受伤害:{taken:.2f}"
             listbox.insert(tk.END, text)
+
+    enemy_box.bind("<<ComboboxSelected>>", refresh_list)
+    sort_box.bind("<<ComboboxSelected>>", refresh_list)
+    min_damage_var.trace_add("write", refresh_list)
+    refresh_list()
     
     def buy_weapon() -> None:
         idx = listbox.curselection()
@@ -69,11 +135,11 @@ def show_weapon_shop(after_callback: Optional[Callable] = None) -> None:
             messagebox.showwarning("提示", "请先选择一把武器！")
             return
         
-        if idx[0] >= len(wd.WEAPONS):
+        if idx[0] >= len(shown):
             messagebox.showwarning("提示", "选择的武器不存在！")
             return
         
-        weapon = wd.WEAPONS[idx[0]]
+        weapon = shown[idx[0]]
         pd.PLAYER["attributes"]["装备1"] = weapon["武器名"]
         
         try:
@@ -150,22 +216,20 @@ def show_character_select():
     main_frame.pack()
 
     def read_preview(filename):
-        import csv
+        from core import csvio
         # 【修复】
         path = safe_path(filename)
         try:
-            with open(path, "r", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                row = next(reader)
-                return {
-                    "name": row["角色名称"],
-                    "Strength": row["Strength"],
-                    "Agility": row["Agility"],
-                    "Toughness": row["Toughness"],
-                    "Influence": row["Influence"],
-                    "Willpower": row["Willpower"],
-                    "Intelligence": row["Intelligence"]
-                }
+            row = next(csvio.read_dicts(path))  # 自动识别编码（utf-8/gbk）
+            return {
+                "name": row["角色名称"],
+                "Strength": row["Strength"],
+                "Agility": row["Agility"],
+                "Toughness": row["Toughness"],
+                "Influence": row["Influence"],
+                "Willpower": row["Willpower"],
+                "Intelligence": row["Intelligence"]
+            }
         except:
             return None
 
@@ -300,14 +364,17 @@ def show_card_shop():
     bought_listbox.pack(side="left", fill="both", expand=True)
     scroll2.config(command=bought_listbox.yview)
 
+    def render_bought(key):
+        i, cid, _ = key
+        info = PURCHASED_CARDS[cid]
+        return f"{i}. {info['卡名']} | 类型：{info['卡牌类型']} | 已购：{info['购买数量']}张 | {info['描述']}"
+
+    # key 为 (序号, 卡牌编号, 购买数量)：再买一张已有的卡只替换这一行，买新卡只在末尾加一行
+    bought_view = listdiff.ListView(bought_listbox, render_bought, empty_text="暂无已购卡牌")
+
     def refresh_bought():
-        bought_listbox.delete(0, tk.END)
-        if not PURCHASED_CARDS:
-            bought_listbox.insert(tk.END, "暂无已购卡牌")
-            return
-        for i, (cid, info) in enumerate(PURCHASED_CARDS.items(), 1):
-            line = f"{i}. {info['卡名']} | 类型：{info['卡牌类型']} | 已购：{info['购买数量']}张 | {info['描述']}"
-            bought_listbox.insert(tk.END, line)
+        bought_view.update((i, cid, info["购买数量"])
+                           for i, (cid, info) in enumerate(PURCHASED_CARDS.items(), 1))
 
     refresh_bought()
 
@@ -393,6 +460,8 @@ if __name__ == "__main__":
         "battle_ready": False
     }
 
+    # 启动时一次性编译全部卡表，后续商店/探索/战斗直接命中缓存
+    catalog.preload()
     show_character_select()
 
 # 只运行逻辑，不触发 GUI
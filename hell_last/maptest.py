@@ -1,44 +1,38 @@
 import random
 
 
-import csv
+from core import catalog  # 卡表统一走目录缓存，不重复解析CSV
 
 def load_map_cards(filename):
     maps = []
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            maps.append({
-                "name": row["地图名"],
-                "description": row["描述"],
-                "effect": row["地图效果"]
-            })
+    for row in catalog.load_rows(filename):
+        maps.append({
+            "name": row["地图名"],
+            "description": row["描述"],
+            "effect": row["地图效果"]
+        })
     return maps
 
 
 def load_event_cards(filename):
     events = []
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            events.append({
-                "name": row["事件名"],
-                "description": row["描述"],
-                "type": row["类型"],
-                "effect": row["效果"]
-            })
+    for row in catalog.load_rows(filename):
+        events.append({
+            "name": row["事件名"],
+            "description": row["描述"],
+            "type": row["类型"],
+            "effect": row["效果"]
+        })
     return events
 
 def load_passage_cards(filename):
     passage = []
-    with open(filename, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            passage.append({
-                "name": row["通道名"],
-                "description": row["描述"],
-                "effect": row["效果"]
-            })
+    for row in catalog.load_rows(filename):
+        passage.append({
+            "name": row["通道名"],
+            "description": row["描述"],
+            "effect": row["效果"]
+        })
     return passage
 
 
@@ -1,7 +1,11 @@
-import csv
 import sys
 import os  # 新增：导入os模块处理路径
-from tkinter import messagebox
+from core import data  # 无界面数据层：只抛异常，弹窗由本模块负责
+
+# ===================== 弹窗（按需导入tkinter，无界面环境也能导入本模块） =====================
+def _messagebox():
+    from tkinter import messagebox
+    return messagebox
 
 # ===================== 核心修复：路径处理 =====================
 def get_script_dir():
@@ -44,73 +48,44 @@ def load_character(filename):
     # 核心修改：把文件名转成绝对路径
     file_path = safe_path(filename)
     try:
-        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                PLAYER["name"] = row["角色名称"].strip()
-                PLAYER["attributes"] = {
-                    "Strength": int(row["Strength"]),
-                    "Agility": int(row["Agility"]),
-                    "Toughness": int(row["Toughness"]),
-                    "Influence": int(row["Influence"]),
-                    "Willpower": int(row["Willpower"]),
-                    "Intelligence": int(row["Intelligence"]),
-                    "装备1": row["装备1"].strip(),
-                    "装备2": row["装备2"].strip(),
-                    "护甲": row["护甲"].strip()
-                }
-        toughness = PLAYER["attributes"].get("Toughness", 0)
-        PLAYER["max_hp"] = 50 + toughness * 2
-        PLAYER["current_hp"] = PLAYER["max_hp"]
-        PLAYER["battle_ready"] = True
-        messagebox.showinfo("成功", f"加载角色：{PLAYER['name']}")
-        return True
-    except FileNotFoundError:
-        messagebox.showerror("错误", f"找不到角色文件：{file_path}\n请确认文件在当前文件夹！")
+        character = data.load_character(file_path)
+    except data.MissingCardFileError:
+        _messagebox().showerror("错误", f"找不到角色文件：{file_path}\n请确认文件在当前文件夹！")
         return False
-    except Exception as e:
-        messagebox.showerror("错误", f"读取角色失败：{str(e)}\n文件路径：{file_path}")
+    except data.CardDataError as e:
+        _messagebox().showerror("错误", f"{str(e)}\n文件路径：{file_path}")
         return False
+    PLAYER["name"] = character["name"]
+    PLAYER["attributes"] = character["attributes"]
+    PLAYER["max_hp"] = character["max_hp"]
+    PLAYER["current_hp"] = PLAYER["max_hp"]
+    PLAYER["battle_ready"] = True
+    _messagebox().showinfo("成功", f"加载角色：{PLAYER['name']}")
+    return True
 
 # ===================== 卡牌加载（修复路径） =====================
 def load_action_cards(filename):
+    """返回 ActionCard 记录列表（字典兼容，数值字段已解析为 int）"""
     # 核心修改：把文件名转成绝对路径
     file_path = safe_path(filename)
-    cards = []
     try:
-        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                cards.append({
-                    "编号": int(row["编号"]),
-                    "卡名": row["卡名"].strip(),
-                    "卡牌类型": row["卡牌类型"].strip(),
-                    "能量消耗": int(row["能量消耗"]),
-                    "移动值": int(row["移动值"]),
-                    "伤害值": int(row["伤害值"]),
-                    "防御值": int(row["防御值"]),
-                    "能量增益": int(row["能量增益"]),
-                    "持有数量": int(row["持有数量"]),
-                    "描述": row["描述"].strip(),
-                    "价格": int(row["价格"])
-                })
-        return cards
-    except FileNotFoundError:
-        messagebox.showerror("错误", f"找不到卡牌文件：{file_path}\n请确认文件在当前文件夹！")
+        return data.get_action_cards(file_path)
+    except data.MissingCardFileError:
+        _messagebox().showerror("错误", f"找不到卡牌文件：{file_path}\n请确认文件在当前文件夹！")
         sys.exit()
-    except Exception as e:
-        messagebox.showerror("错误", f"读取卡牌失败：{str(e)}\n文件路径：{file_path}")
+    except data.CardDataError as e:
+        _messagebox().showerror("错误", f"读取卡牌失败：{str(e)}\n文件路径：{file_path}")
         sys.exit()
 
 # ===================== 卡牌购买/重置 =====================
 def buy_card(card):
     if PLAYER["gold"] < card["价格"]:
-        messagebox.showwarning("金币不足", f"需要{card['价格']}金币，当前只有{PLAYER['gold']}")
+        _messagebox().showwarning("金币不足", f"需要{card['价格']}金币，当前只有{PLAYER['gold']}")
         return False
     PLAYER["gold"] -= card["价格"]
     PLAYER["cards"].append(card)
     PLAYER["card_names"].append(card["卡名"])
-    messagebox.showinfo("购买成功", f"已购买【{card['卡名']}】，剩余金币：{PLAYER['gold']}")
+    _messagebox().showinfo("购买成功", f"已购买【{card['卡名']}】，剩余金币：{PLAYER['gold']}")
     return True
 
 def reset_cards():
@@ -122,7 +97,7 @@ def reset_cards():
 def get_battle_params():
     """仅返回参数，供explore_core/battle_core调用"""
     if not PLAYER["battle_ready"]:
-        messagebox.showerror("错误", "未选择角色，无法进入探索/战斗！")
+        _messagebox().showerror("错误", "未选择角色，无法进入探索/战斗！")
         return None
     return {
         "角色名": PLAYER["name"],
@@ -0,0 +1,274 @@
+"""
+战斗蒙特卡洛模拟：用和 battle_core 相同的规则（core.battle 引擎）批量自动打仗，统计胜率
+
+用法：
+    python simulate.py -c William.csv -w 烈焰长剑 -e purplemaze -k 3 -n 100000
+    python simulate.py -c Bard.csv --event 腐化植物 --deck 轻击:6,木盾:4,步行:4 -n 1000000 -j 8
+    python simulate.py ... --checkpoint sim.json          # 每完成一块写一次进度
+    python simulate.py ... --checkpoint sim.json --resume # 从进度文件继续
+
+- 角色：角色卡 CSV（生命 = 50 + 坚韧×2，满血开战）
+- 武器：weapon.csv 中的武器名；不指定时用角色卡的「装备1」，都没有则为基础长剑
+- 牌组：「卡名或编号:数量」逗号分隔；不指定时用默认牌组（规则同 battle_core.init_player_deck）
+- 敌人：--enemy 敌人名 + --count 数量，或 --event 事件名（取事件的角色和数量，数量可为 2+d3）
+- 出牌策略：core.battle.greedy_policy
+工作按 --chunk 场一块分给进程池；每块的随机种子由 --seed 和块号派生，
+所以结果只取决于种子，与进程数、是否中途续跑无关。
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import battle
+from core import catalog
+from core import data
+from core import deck
+from core import dice
+from core import rng
+
+OUTCOMES = (battle.WIN, battle.LOSE, battle.STALEMATE, battle.ROUND_CAP)
+OUTCOME_LABELS = {battle.WIN: "胜利", battle.LOSE: "失败", battle.STALEMATE: "僵局", battle.ROUND_CAP: "回合上限"}
+
+CHECKPOINT_VERSION = 1
+
+
+class SimulationError(Exception):
+    """模拟参数错误（找不到角色/武器/卡牌/敌人等）"""
+
+
+# ===================== 参数解析 =====================
+def parse_deck_spec(spec):
+    """「卡名或编号:数量,...」-> [[卡名或编号, 数量]]（列表形式，和进度文件里的 JSON 一致）"""
+    entries = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        key, _, count = part.rpartition(":")
+        if not key:
+            key, count = count, "1"
+        try:
+            entries.append([key.strip(), int(count)])
+        except ValueError:
+            raise SimulationError(f"牌组写法错误：{part}（应为 卡名:数量）") from None
+    return entries
+
+def build_config(args):
+    """命令行参数 -> 可 JSON 序列化的模拟配置（同时作为进度文件的校验依据）"""
+    if args.event:
+        event = next((e for e in data.get_event_cards() if e.name == args.event), None)
+        if event is None:
+            raise SimulationError(f"eventcard.csv 中没有事件：{args.event}")
+        enemy, count = event.role, event.quantity or "1"
+    else:
+        enemy, count = args.enemy, args.count
+    if not enemy:
+        raise SimulationError("需要 --enemy 或带角色的 --event")
+    return {
+        "character": args.character,
+        "weapon": args.weapon,
+        "deck": parse_deck_spec(args.deck) if args.deck else [],
+        "enemy": enemy,
+        "count": str(count),
+        "seed": args.seed,
+        "max_rounds": args.max_rounds,
+        "chunk": args.chunk,
+    }
+
+
+# ===================== 组装战斗参数（每个进程做一次） =====================
+def prepare(config):
+    """配置 -> (PlayerLoadout, Enemy, 卡表, 牌库编号数组, 数量表达式)"""
+    try:
+        character = data.load_character(catalog.safe_path(config["character"]))
+    except data.CardDataError as e:
+        raise SimulationError(str(e)) from None
+
+    weapon_name = config["weapon"] or character["attributes"].get("装备1")
+    weapon = data.find_weapon(weapon_name) if weapon_name else None
+    if config["weapon"] and weapon is None:
+        raise SimulationError(f"weapon.csv 中没有武器：{config['weapon']}")
+    player = battle.build_player(character["name"], character["max_hp"], character["attributes"], weapon)
+
+    cards = data.get_action_cards()
+    by_name = {c.name: c for c in cards}
+    by_id = {str(c.id): c for c in cards}
+    purchased = []
+    for key, n in config["deck"]:
+        card = by_name.get(key) or by_id.get(key)
+        if card is None:
+            raise SimulationError(f"action_card.csv 中没有卡牌：{key}")
+        purchased.extend([card] * n)
+    cards = battle.build_deck(purchased)
+    table = deck.CardTable(cards)
+
+    enemies = data.get_enemies()
+    enemy = enemies.get(config["enemy"])
+    if enemy is None:
+        raise SimulationError(f"enemycharacter.csv 中没有敌人：{config['enemy']}")
+    try:
+        count = dice.compile_dice(config["count"])
+    except dice.DiceSyntaxError as e:
+        raise SimulationError(str(e)) from None
+    return player, enemy, table, table.ids(cards), count
+
+
+# ===================== 统计 =====================
+def empty_stats():
+    stats = {outcome: 0 for outcome in OUTCOMES}
+    stats.update({"battles": 0, "rounds": 0, "hp_lost": 0, "hp_lost_sq": 0})
+    return stats
+
+def merge_stats(total, part):
+    for key, value in part.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+# ===================== 子进程 =====================
+_worker_setup = None
+
+def _init_worker(config):
+    global _worker_setup
+    _worker_setup = prepare(config)
+
+def run_chunk(seed, index, battles, max_rounds, skip=0):
+    """
+    跑一块战斗；随机数流由 (种子, 块号) 派生
+    skip：前 skip 场已在之前统计过（续跑时末块变长），重放但不计入，保证随机序列一致
+    """
+    player, enemy, table, base_ids, count_dice = _worker_setup
+    streams = rng.RngService(seed).fork(f"chunk:{index}")
+    player_rng = streams.stream(rng.PLAYER_DICE)
+    npc_rng = streams.stream(rng.NPC_DICE)
+    shuffle_rng = streams.stream(rng.DECK_SHUFFLE)
+
+    stats = empty_stats()
+    for i in range(battles):
+        engine = battle.BattleEngine(
+            player, enemy, max(0, count_dice(npc_rng)), deck.Deck(base_ids, shuffle_rng, True, table),
+            max_rounds=max_rounds, player_rng=player_rng, npc_rng=npc_rng, shuffle_rng=shuffle_rng)
+        outcome = engine.run()
+        if i < skip:
+            continue
+        lost = player.hp - max(engine.player_hp, 0)
+        stats[outcome] += 1
+        stats["rounds"] += engine.round_num
+        stats["hp_lost"] += lost
+        stats["hp_lost_sq"] += lost * lost
+    stats["battles"] = battles - skip
+    return index, battles, stats
+
+
+# ===================== 进度文件 =====================
+def load_checkpoint(path, config):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        raise SimulationError(f"进度文件无法读取：{e}") from None
+    if config["seed"] is None:
+        config["seed"] = state.get("config", {}).get("seed")  # 未指定种子时沿用进度文件的
+    if state.get("version") != CHECKPOINT_VERSION or state.get("config") != config:
+        raise SimulationError("进度文件与当前参数不一致（角色/武器/牌组/敌人/种子需相同），请换一个文件或去掉 --resume")
+    return state
+
+def save_checkpoint(path, state):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ===================== 主流程 =====================
+def simulate(config, battles, jobs=None, checkpoint=None, resume=False, checkpoint_every=5.0):
+    """
+    跑 battles 场战斗，返回合并后的统计；checkpoint 指定时定期写入进度
+    resume=True 时跳过进度文件里已完成的块（可以加大 battles 接着跑）
+    """
+    prepare(config)  # 先在主进程校验参数，出错不用等进程池
+    state = None
+    if checkpoint and resume:
+        state = load_checkpoint(checkpoint, config)
+    if config["seed"] is None:
+        config["seed"] = rng.current_seed()
+    chunk = config["chunk"]
+    chunks = [(i, min(chunk, battles - i * chunk)) for i in range(math.ceil(battles / chunk))]
+    if state is None:
+        state = {"version": CHECKPOINT_VERSION, "config": config, "done": [], "stats": empty_stats()}
+    done = dict(state["done"])   # {块号: 已完成场数}；末块可能因加大场数而变长
+    todo = [(i, n, done.get(i, 0)) for i, n in chunks if done.get(i, 0) < n]
+    if done:
+        print(f"↩️ 从进度文件继续：已完成 {state['stats']['battles']} 场，剩余 {len(todo)} 块")
+
+    last_save = time.monotonic()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(config,)) as pool:
+        futures = [pool.submit(run_chunk, config["seed"], i, n, config["max_rounds"], skip)
+                   for i, n, skip in todo]
+        for future in as_completed(futures):
+            index, battles_done, stats = future.result()
+            merge_stats(state["stats"], stats)
+            done[index] = battles_done
+            state["done"] = sorted(done.items())
+            if checkpoint and time.monotonic() - last_save >= checkpoint_every:
+                save_checkpoint(checkpoint, state)
+                last_save = time.monotonic()
+    if checkpoint:
+        save_checkpoint(checkpoint, state)
+    return state["stats"]
+
+def format_report(config, stats):
+    n = stats["battles"]
+    if not n:
+        return "没有完成任何战斗"
+    lines = [f"🎲 {n} 场 | 角色 {config['character']} | 武器 {config['weapon'] or '(角色卡装备)'} "
+             f"| 敌人 {config['enemy']} × {config['count']} | 种子 {config['seed']}"]
+    for outcome in OUTCOMES:
+        p = stats[outcome] / n
+        half = 1.96 * math.sqrt(p * (1 - p) / n)
+        lines.append(f"  {OUTCOME_LABELS[outcome]}：{p:.2%} ± {half:.2%}（{stats[outcome]} 场）")
+    mean = stats["hp_lost"] / n
+    std = math.sqrt(max(0.0, stats["hp_lost_sq"] / n - mean * mean))
+    lines.append(f"  平均回合数：{stats['rounds'] / n:.2f}")
+    lines.append(f"  平均损失生命：{mean:.2f}（标准差 {std:.2f}）")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="战斗蒙特卡洛模拟（规则同 battle_core）")
+    parser.add_argument("-c", "--character", required=True, help="角色卡 CSV（如 William.csv）")
+    parser.add_argument("-w", "--weapon", default=None, help="weapon.csv 中的武器名（默认角色卡装备1）")
+    parser.add_argument("-d", "--deck", default=None, help="已购牌组：卡名或编号:数量，逗号分隔")
+    parser.add_argument("-e", "--enemy", default=None, help="enemycharacter.csv 中的敌人名")
+    parser.add_argument("-k", "--count", default="1", help="敌人数量（可为骰子表达式，如 2+d3）")
+    parser.add_argument("--event", default=None, help="eventcard.csv 中的事件名（取其角色和数量）")
+    parser.add_argument("-n", "--battles", type=int, default=10000, help="模拟场数")
+    parser.add_argument("--chunk", type=int, default=10000, help="每块场数")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子（默认随机）")
+    parser.add_argument("--max-rounds", type=int, default=battle.MAX_ROUNDS, help="回合上限")
+    parser.add_argument("--checkpoint", default=None, help="进度文件（JSON）")
+    parser.add_argument("--resume", action="store_true", help="从进度文件继续")
+    args = parser.parse_args(argv)
+
+    if args.battles <= 0 or args.chunk <= 0:
+        parser.error("--battles 和 --chunk 必须为正数")
+    try:
+        config = build_config(args)
+        start = time.perf_counter()
+        stats = simulate(config, args.battles, args.jobs, args.checkpoint, args.resume)
+    except (SimulationError, data.CardDataError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(format_report(config, stats))
+    print(f"⏱️ 用时 {time.perf_counter() - start:.2f} 秒")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())